@@ -0,0 +1,229 @@
+"""Frontend (src/) direkt aus dem Backend ausliefern.
+
+Jede Datei bekommt einen Namen mit Inhalts-Hash (style.3f2a9c1b04.scss) und darf
+ein Jahr im Browser-Cache bleiben; neue Inhalte haben automatisch neue URLs.
+Nur die HTML-Seiten werden jedes Mal revalidiert – in ihnen werden die
+../css/…-Verweise beim Ausliefern auf die Hash-Namen umgeschrieben.
+
+Drink-Bilder (1024×1024-PNGs, ~1,3 MB) werden mit Pillow auf IMAGE_SIZES
+verkleinert, als WebP und PNG im ASSET_CACHE_DIR abgelegt und je nach
+Accept-Header ausgeliefert. Ohne Pillow gibt es die Originale.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from urllib.parse import quote
+
+from flask import Blueprint, Response, abort, request, send_file
+
+from utils.lazy import Lazy
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+FRONTEND_DIR = os.environ.get(
+    'COCKTAIL_FRONTEND_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'src')
+)
+ASSET_CACHE_DIR = os.environ.get('COCKTAIL_ASSET_CACHE_DIR', 'data/assets')
+
+IMAGE_SIZES = {'thumb': 512}     # Kantenlänge in px (Popup zeigt 260 CSS-px, also 2x für Tablets)
+MENU_IMAGE_SIZE = 'thumb'
+WEBP_QUALITY = 80
+IMMUTABLE = 'public, max-age=31536000, immutable'
+PAGES = {'': 'html/index.html', 'admin': 'html/admin.html'}
+
+# relative Verweise in den HTML-Seiten: href="../css/style.scss", src="../js/scripts.js"
+_ASSET_REF = re.compile(r'''(href|src)="\.\./([^"]+)"''')
+
+assets_bp = Blueprint('assets', __name__)
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+
+class AssetManifest:
+    """Hash-Namen aller Dateien unter root: 'css/style.scss' ↔ 'css/style.3f2a9c1b04.scss'."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.urls = {}       # relativer Pfad -> Hash-Name
+        self.files = {}      # Hash-Name -> (absoluter Pfad, Hash)
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if rel.startswith('html/'):
+                    continue
+                digest = _file_hash(path)
+                stem, ext = os.path.splitext(rel)
+                fingerprinted = f'{stem}.{digest}{ext}'
+                self.urls[rel] = fingerprinted
+                self.files[fingerprinted] = (path, digest)
+        print(f"🗂️ {len(self.files)} Frontend-Dateien mit Hash-Namen")
+
+    def url(self, rel):
+        fingerprinted = self.urls.get(rel)
+        return '/assets/' + quote(fingerprinted) if fingerprinted else None
+
+    def image_url(self, rel, size):
+        fingerprinted = self.urls.get(rel)
+        return f'/assets/img/{size}/' + quote(fingerprinted) if fingerprinted else None
+
+    def render_page(self, rel):
+        with open(os.path.join(self.root, rel), encoding='utf-8') as f:
+            html = f.read()
+
+        def replace(match):
+            url = self.url(match.group(2))
+            return f'{match.group(1)}="{url}"' if url else match.group(0)
+        return _ASSET_REF.sub(replace, html)
+
+
+class ImagePipeline:
+    """Verkleinerte WebP-/PNG-Varianten der Drink-Bilder, auf der Platte zwischengespeichert."""
+
+    FORMATS = {'webp': 'image/webp', 'png': 'image/png'}
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def variant(self, source, digest, size, fmt):
+        """Pfad der Variante (wird bei Bedarf erzeugt) oder None ohne Pillow."""
+        if not self.enabled:
+            return None
+        path = os.path.join(self.cache_dir, f'{digest}-{IMAGE_SIZES[size]}.{fmt}')
+        if os.path.exists(path):
+            return path
+        with self._lock_for(path):
+            if not os.path.exists(path):
+                self._render(source, path, IMAGE_SIZES[size], fmt)
+        return path
+
+    def warm(self, manifest):
+        """Alle Varianten erzeugen (Hintergrund-Thread beim Start)."""
+        if not self.enabled:
+            print("⚠️ Pillow nicht installiert – Drink-Bilder werden in Originalgröße ausgeliefert")
+            return
+        count = 0
+        for fingerprinted, (path, digest) in manifest.files.items():
+            if not fingerprinted.startswith('images/'):
+                continue
+            for size in IMAGE_SIZES:
+                for fmt in self.FORMATS:
+                    self.variant(path, digest, size, fmt)
+                    count += 1
+        print(f"🖼️ {count} Bildvarianten bereit ({self.cache_dir})")
+
+    def _lock_for(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _render(source, path, edge, fmt):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with Image.open(source) as image:
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            if fmt == 'webp':
+                image.save(tmp, 'WEBP', quality=WEBP_QUALITY, method=4)
+            else:
+                image.save(tmp, 'PNG', optimize=True)
+        os.replace(tmp, path)   # andere Worker sehen nie eine halbe Datei
+
+
+# Werden von init_app() gesetzt
+manifest = None
+pipeline = None
+
+
+def init_app(app):
+    """Frontend unter /ui/ ausliefern; Hashes und Bildvarianten entstehen im Hintergrund."""
+    global manifest, pipeline
+
+    app.register_blueprint(assets_bp)
+    if not os.path.isdir(FRONTEND_DIR):
+        print(f"⚠️ Frontend-Verzeichnis {FRONTEND_DIR} nicht gefunden – /ui/ ist deaktiviert")
+        return
+    manifest = Lazy(lambda: AssetManifest(FRONTEND_DIR), 'asset_manifest')
+    pipeline = ImagePipeline(ASSET_CACHE_DIR)
+    threading.Thread(target=_warm_up, daemon=True, name='asset-pipeline').start()
+
+
+def _warm_up():
+    try:
+        pipeline.warm(manifest.get())
+    except Exception as e:
+        print(f"⚠️ Bildvarianten konnten nicht erzeugt werden: {e}")
+
+
+def drink_image_url(image_path, base_url):
+    """'../images/Mojito.png' aus dem Menü auf die absolute Hash-URL der Menü-Variante abbilden.
+
+    Absolut (base_url = request.host_url), weil das Frontend auch von file:// oder
+    einem Dev-Server geladen wird und die API über eine andere Origin anspricht.
+    """
+    if manifest is None or not image_path.startswith('../'):
+        return image_path
+    url = manifest.image_url(image_path[3:], MENU_IMAGE_SIZE)
+    return base_url.rstrip('/') + url if url else image_path
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Routes
+# ─────────────────────────────────────────────────────────────────────────────
+
+@assets_bp.route('/ui/', defaults={'page': ''}, methods=['GET'])
+@assets_bp.route('/ui/<page>', methods=['GET'])
+def serve_page(page):
+    if manifest is None or page not in PAGES:
+        abort(404)
+    response = Response(manifest.render_page(PAGES[page]), mimetype='text/html')
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@assets_bp.route('/assets/img/<size>/<path:name>', methods=['GET'])
+def serve_image(size, name):
+    # nur Drink-Bilder: Pillow kann mit Skripten oder Stylesheets nichts anfangen
+    if manifest is None or size not in IMAGE_SIZES or not name.startswith('images/') or name not in manifest.files:
+        abort(404)
+    source, digest = manifest.files[name]
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'png'
+    path = pipeline.variant(source, digest, size, fmt)
+    if path is None:    # ohne Pillow: Original
+        response = send_file(source, mimetype='image/png', conditional=True, etag=digest)
+    else:
+        response = send_file(path, mimetype=ImagePipeline.FORMATS[fmt], conditional=True,
+                             etag=f'{digest}-{size}-{fmt}')
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept')
+    return response
+
+
+@assets_bp.route('/assets/<path:name>', methods=['GET'])
+def serve_asset(name):
+    if manifest is None or name not in manifest.files:
+        abort(404)
+    path, digest = manifest.files[name]
+    response = send_file(path, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                         conditional=True, etag=digest)
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
@@ -1,12 +1,252 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
 from database.cocktail_db import CocktailDatabase
 from core.pump_controller import PumpController
+from core.order_queue import OrderQueue
+from core.forecast import StockForecaster
+from core import portioning
+from api import assets, serializers
+from core.hardware_service import HardwareClient
+from utils.events import EventBus
+from utils.lazy import Lazy
+from utils.lifecycle import Lifecycle
+from utils.metrics import registry as metrics
+from utils.rate_limit import PIN_LIMITS, RateLimiter
+import gzip
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import tempfile
 import threading
+import time
+
+# Überschreibbar per Umgebung, z. B. für Benchmarks gegen eine generierte Datenbank
+DB_PATH = os.environ.get('COCKTAIL_DB_PATH', 'database/mixes.db')
+PUMP_TIME_SCALE = float(os.environ.get('COCKTAIL_PUMP_TIME_SCALE', '1'))
+# Leistungsgrenze des Netzteils (0 = alle Pumpen gleichzeitig) und ob lange Pours geteilt werden dürfen
+MAX_CONCURRENT_PUMPS = int(os.environ.get('COCKTAIL_MAX_CONCURRENT_PUMPS', '0'))
+SPLIT_POURS = os.environ.get('COCKTAIL_SPLIT_POURS', '0') == '1'
+# Nachfüll-Warnung, wenn eine Zutat beim aktuellen Verbrauch früher leer ist
+STOCK_ALERT_HORIZON_MIN = float(os.environ.get('COCKTAIL_STOCK_ALERT_MIN', '20'))
+
+# Im Produktionsbetrieb (serve.py) besitzt ein eigener Prozess die Pumpen;
+# die Worker erreichen ihn über diesen Unix-Socket.
+HARDWARE_SOCKET = os.environ.get('COCKTAIL_HARDWARE_SOCKET')
+
+# So lange warten Requests beim Start auf die Vorbereitung, bevor sie 503 bekommen
+STARTUP_WAIT_SEC = 10
 
 cocktails_bp = Blueprint('cocktails', __name__)
 
-db = CocktailDatabase()
-pump_controller = PumpController()
+# Werden von init_app() gesetzt
+event_bus = EventBus()
+lifecycle = Lifecycle()
+db = None
+forecaster = None
+hardware = None
+pump_controller = None
+order_queue = None
+
+
+def init_app(app):
+    """Blueprint registrieren und Dienste anlegen.
+
+    Direkt passiert nur, was billig ist (Datenbank-Objekt ohne Abfrage). Schema-Prüfung,
+    Menü-Cache und PIN laden im Hintergrund; die Hardware (GPIO-Setup bzw. Verbindung
+    zum Hardware-Prozess) wird danach oder beim ersten Zugriff initialisiert.
+    """
+    global lifecycle, db, forecaster, hardware, pump_controller, order_queue, pin_limiter
+
+    app.register_blueprint(cocktails_bp, url_prefix='/api')
+    if serializers.orjson is not None:
+        app.json = serializers.FastJSONProvider(app)
+    lifecycle = Lifecycle()
+    try:
+        with lifecycle.phase('database'):
+            db = CocktailDatabase(DB_PATH, events=event_bus)
+    except Exception as e:
+        lifecycle.fail(e)   # App läuft weiter: Liveness ja, Readiness nein
+        return
+
+    forecaster = StockForecaster(db, events=event_bus, horizon_sec=STOCK_ALERT_HORIZON_MIN * 60)
+    db.add_level_listener(forecaster.check)
+
+    if HARDWARE_SOCKET:
+        hardware = Lazy(lambda: HardwareClient(
+            HARDWARE_SOCKET, os.environ['COCKTAIL_HARDWARE_AUTHKEY'].encode(), events=event_bus
+        ), 'hardware')
+        pump_controller = Lazy(lambda: hardware.get().pump_controller, 'pump_controller')
+        order_queue = Lazy(lambda: hardware.get().order_queue, 'order_queue')
+        # Fehlversuche zählt der Hardware-Prozess für alle Worker gemeinsam
+        pin_limiter = Lazy(lambda: hardware.get().pin_limiter, 'pin_limiter')
+    else:
+        hardware = None
+        pump_controller = Lazy(lambda: PumpController(
+            events=event_bus, time_scale=PUMP_TIME_SCALE,
+            max_concurrent_pumps=MAX_CONCURRENT_PUMPS, split_pours=SPLIT_POURS,
+        ), 'pump_controller')
+        order_queue = Lazy(lambda: OrderQueue(
+            pump_controller.get(), on_finished=_on_order_finished, events=event_bus
+        ), 'order_queue')
+
+    threading.Thread(target=_warm_up, daemon=True, name='warm-up').start()
+
+
+def _warm_up():
+    try:
+        with lifecycle.phase('schema'):
+            db.check_schema()
+        with lifecycle.phase('menu_cache'):
+            db.get_available_cocktails()
+        with lifecycle.phase('pin'):
+            _load_pin()
+    except Exception as e:
+        lifecycle.fail(e)
+        return
+    lifecycle.mark_ready()
+
+    # Menüs werden schon ausgeliefert; die Hardware kommt danach
+    try:
+        with lifecycle.phase('hardware'):
+            order_queue.get()
+    except Exception as e:
+        print(f"⚠️ Hardware-Initialisierung fehlgeschlagen, neuer Versuch beim ersten Zugriff: {e}")
+
+
+def _on_order_finished(order, success):
+    # Ergebnis loggen und nicht geförderte Reste der Reservierung zurückbuchen
+    refund = () if success else order.unpoured_recipe()
+    if order.log_id is not None:
+        db.finish_order(order.log_id, order.status, order.started_at, order.finished_at, refund)
+    elif refund:
+        db.restock_recipe(refund)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lifecycle
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Antworten auch während des Starts und nach einem Fehlstart
+LIFECYCLE_ENDPOINTS = {'cocktails.liveness', 'cocktails.readiness'}
+
+
+@cocktails_bp.before_request
+def _wait_until_ready():
+    if request.endpoint in LIFECYCLE_ENDPOINTS:
+        return None
+    if not lifecycle.wait_ready(STARTUP_WAIT_SEC):
+        return jsonify({
+            'error': 'Backend ist noch nicht betriebsbereit',
+            'startup': lifecycle.report(),
+        }), 503
+    return None
+
+
+@cocktails_bp.route('/health/live', methods=['GET'])
+def liveness():
+    return jsonify({'alive': True, 'uptime_sec': round(lifecycle.uptime_sec(), 1)})
+
+
+@cocktails_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """200, sobald Menüs ausgeliefert werden können; enthält den Startbericht mit Phasen-Zeiten."""
+    report = dict(lifecycle.report(),
+                  hardware_initialized=pump_controller is not None and pump_controller.initialized)
+    return jsonify(report), 200 if report['ready'] else 503
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────────────────────────────────────
+
+@cocktails_bp.before_request
+def _start_timer():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+
+
+@cocktails_bp.after_request
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Route-Muster statt URL, damit IDs keine neuen Zeitreihen erzeugen
+        endpoint = request.url_rule.rule if request.url_rule else 'unknown'
+        metrics.observe('cocktail_http_request_duration_seconds', time.perf_counter() - started,
+                        endpoint=endpoint, method=request.method)
+        metrics.inc('cocktail_http_requests_total', endpoint=endpoint, method=request.method,
+                    status=response.status_code)
+    return response
+
+
+def _collect_gauges(registry):
+    registry.set_gauge('cocktail_event_subscribers', event_bus.subscriber_count)
+    if not isinstance(pin_limiter, Lazy) or pin_limiter.initialized:
+        registry.set_gauge('cocktail_pin_locked_clients', pin_limiter.stats()['locked_clients'])
+    if db is None:
+        return
+    if order_queue.initialized:   # Export soll die Hardware nicht initialisieren
+        registry.set_gauge('cocktail_queue_depth', order_queue.depth)
+        registry.set_gauge('cocktail_is_mixing', int(pump_controller.is_mixing))
+        registry.set_gauge('cocktail_pulse_max_lateness_seconds', pump_controller.max_lateness_sec)
+    for key, value in db.get_cache_stats().items():
+        registry.set_gauge('cocktail_menu_cache', int(value), stat=key)
+
+
+metrics.add_collector(_collect_gauges)
+
+
+@cocktails_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """?scope=hardware liefert im Produktionsbetrieb die Metriken des Hardware-Prozesses."""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metriken sind deaktiviert (COCKTAIL_METRICS=0)'}), 404
+    if request.args.get('scope') == 'hardware' and hardware is not None:
+        return Response(hardware.render_metrics(), mimetype='text/plain; version=0.0.4')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HTTP caching
+# ─────────────────────────────────────────────────────────────────────────────
+
+GZIP_MIN_BYTES = 512
+RESPONSE_CACHE_MAX = 256    # Schlüssel enthalten den Host-Header, also vom Client wählbar
+
+_response_cache = {}    # key -> vorserialisierte Antwort der aktuellen Inventar-Version
+_response_cache_lock = threading.Lock()
+
+
+def _cached_json(key, build):
+    """JSON-Antwort einmal pro Inventar-Version bauen, mit ETag/Last-Modified und 304-Handling."""
+    version, modified = db.get_inventory_version()
+    entry = _response_cache.get(key)
+    if entry is None or entry['version'] != version:
+        body = serializers.dumps(build())
+        entry = {
+            'version': version,
+            'modified': modified,
+            'etag': hashlib.sha1(body).hexdigest()[:20],
+            'body': body,
+            'gzip': gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None,
+        }
+        with _response_cache_lock:
+            if key not in _response_cache and len(_response_cache) >= RESPONSE_CACHE_MAX:
+                _response_cache.clear()
+            _response_cache[key] = entry
+
+    use_gzip = entry['gzip'] is not None and 'gzip' in request.accept_encodings
+    response = Response(entry['gzip'] if use_gzip else entry['body'], mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(entry['etag'] + '-gz')    # starke ETags unterscheiden sich je Kodierung
+    else:
+        response.set_etag(entry['etag'])
+    response.last_modified = entry['modified']
+    response.headers['Cache-Control'] = 'no-cache'  # immer revalidieren, 304 ist billig
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Cocktails
@@ -14,38 +254,133 @@ pump_controller = PumpController()
 
 @cocktails_bp.route('/cocktails', methods=['GET'])
 def get_cocktails():
+    """?alkoholisch=true|false, ?compact=1 (Zutaten-Wörterbuch), ?fields=id,name,…"""
     alkohol_filter = request.args.get('alkoholisch')
     if alkohol_filter == 'true':
-        cocktails = db.get_alcoholic_cocktails()
+        view, load = 'alcoholic', db.get_alcoholic_cocktails
     elif alkohol_filter == 'false':
-        cocktails = db.get_non_alcoholic_cocktails()
+        view, load = 'non_alcoholic', db.get_non_alcoholic_cocktails
     else:
-        cocktails = db.get_available_cocktails()
-    return jsonify(cocktails)
+        view, load = 'all', db.get_available_cocktails
+    try:
+        fields = serializers.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    compact = request.args.get('compact') in ('1', 'true')
+
+    # ein Cache-Eintrag je Ansicht, Modus und Feldauswahl (nur bekannte Felder, also begrenzt);
+    # Bild-URLs sind absolut und hängen deshalb auch vom Host ab
+    base_url = request.host_url
+    key = f"cocktails:{view}:{'compact' if compact else 'full'}:{','.join(fields or ())}"
+    if fields is None or 'image_path' in fields:
+        key += f":{base_url}"
+    serialize = serializers.compact_menu if compact else serializers.full_menu
+
+    def image_url(path):
+        return assets.drink_image_url(path, base_url)
+    return _cached_json(key, lambda: serialize(load(), fields, image_url=image_url))
+
+
+@cocktails_bp.route('/cocktails/<int:cocktail_id>/servings', methods=['GET'])
+def get_cocktail_servings(cocktail_id):
+    servings = db.get_servings_left(cocktail_id)
+    if servings is None:
+        return jsonify({'error': f'Cocktail {cocktail_id} nicht gefunden'}), 404
+    return jsonify(servings)
+
+
+@cocktails_bp.route('/cocktails/<int:cocktail_id>/plan', methods=['GET'])
+def get_mix_plan(cocktail_id):
+    """Geplanter Pour-Ablauf; ?max_pumps=3&split=true probiert andere Einstellungen aus."""
+    cocktail = db.get_cocktail_by_id(cocktail_id)
+    if not cocktail:
+        return jsonify({'error': 'Cocktail nicht verfügbar'}), 404
 
+    max_pumps = request.args.get('max_pumps', type=int)
+    if max_pumps is not None and max_pumps < 0:
+        return jsonify({'error': 'max_pumps darf nicht negativ sein'}), 400
+    split = request.args.get('split')
+    split_pours = None if split is None else split.lower() in ('1', 'true')
 
-@cocktails_bp.route('/order', methods=['POST'])
-def order_cocktail():
-    data = request.get_json()
-    cocktail_id = data.get('cocktail_id')
+    plan = pump_controller.plan_mix(cocktail['liquid_recipe'], max_concurrent_pumps=max_pumps,
+                                    split_pours=split_pours)
+    return jsonify(dict(plan, cocktail_id=cocktail_id, cocktail=cocktail['name']))
 
-    cocktail = db.get_cocktail_by_id(cocktail_id)
+
+@cocktails_bp.route('/cocktails/<int:cocktail_id>/portions', methods=['GET'])
+def get_portions(cocktail_id):
+    """Alle Größen/Stärken eines Drinks mit Mengen, Mixdauer und Restportionen aus dem Vorrat."""
+    cocktail = db.get_cocktail(cocktail_id)
     if not cocktail:
-        return jsonify({'error': 'Cocktail nicht verfügbar'}), 400
+        return jsonify({'error': f'Cocktail {cocktail_id} nicht gefunden'}), 404
+
+    portions = []
+    for size, strength in portioning.portion_options(cocktail):
+        try:
+            scaled = portioning.scale_cocktail(cocktail, size, strength)
+        except ValueError:
+            continue
+        stock = db.check_stock(scaled['liquid_recipe'])
+        portions.append({
+            'size': size,
+            'strength': strength,
+            'glass_size_ml': scaled['glass_size_ml'],
+            'liquid_ingredients': scaled['liquid_recipe'],
+            'duration_sec': round(pump_controller.estimate_duration(scaled['liquid_recipe']), 1),
+            'servings_left': stock['servings'],
+            'available': not stock['missing_ml'],
+        })
+    return jsonify({'cocktail_id': cocktail_id, 'cocktail': cocktail['name'], 'portions': portions})
 
-    def mix_in_background():
-        success = pump_controller.mix_cocktail(cocktail['liquid_recipe'], cocktail['name'])
-        if success:
-            for ingredient in cocktail['liquid_recipe']:
-                db.update_ingredient_level(ingredient['ingredient_id'], ingredient['amount_ml'])
 
-    threading.Thread(target=mix_in_background).start()
+@cocktails_bp.route('/order', methods=['POST'])
+def order_cocktail():
+    """POST JSON: {"cocktail_id": 1, "size": "small", "strength": "double"}  (size/strength optional)"""
+    data = request.get_json()
+    cocktail_id = data.get('cocktail_id')
+    size, strength = data.get('size'), data.get('strength')
 
+    if size is None and strength is None:
+        cocktail = db.get_cocktail_by_id(cocktail_id)
+        if not cocktail:
+            return jsonify({'error': 'Cocktail nicht verfügbar'}), 400
+    else:
+        # Eine kleinere Portion kann noch gehen, wenn die Normalgröße nicht mehr reicht
+        cocktail = db.get_cocktail(cocktail_id)
+        if not cocktail:
+            return jsonify({'error': 'Cocktail nicht verfügbar'}), 400
+        try:
+            cocktail = portioning.scale_cocktail(cocktail, size, strength)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        missing = db.check_stock(cocktail['liquid_recipe'])['missing_ml']
+        if missing:
+            return jsonify({
+                'error': 'Nicht genügend Vorrat für diese Portion',
+                'missing_ml': {str(ing_id): amount for ing_id, amount in missing.items()},
+            }), 409
+
+    # Vorrat atomar reservieren, damit zwei gleichzeitige Bestellungen
+    # nicht beide die Verfügbarkeitsprüfung bestehen und eine Flasche überziehen.
+    log_id = db.reserve_order(cocktail)
+    if log_id is None:
+        return jsonify({'error': 'Nicht genügend Vorrat für diesen Cocktail'}), 409
+
+    order = order_queue.submit(cocktail, log_id=log_id)
+    if order is None:
+        db.finish_order(log_id, 'rejected', refund_recipe=cocktail['liquid_recipe'])
+        return jsonify({'error': 'Warteschlange voll, bitte später erneut bestellen'}), 503
+
+    order_info = order_queue.get_order(order.id)
     response = {
-        'status': 'mixing',
+        'status': order_info['status'],
+        'order_id': order.id,
+        'position': order_info['position'],
+        'eta_sec': order_info['eta_sec'],
         'cocktail': cocktail['name'],
         'alkoholisch': cocktail['alkoholisch'],
         'volume': f"{cocktail['glass_size_ml']}ml",
+        'portion': cocktail.get('portion'),
         'liquid_ingredients': cocktail['liquid_recipe'],
         'manual_steps': cocktail['manual_ingredients'] if cocktail['requires_manual_steps'] else [],
     }
@@ -56,14 +391,106 @@ def order_cocktail():
     return jsonify(response)
 
 
+@cocktails_bp.route('/order/<int:order_id>', methods=['GET'])
+def get_order(order_id):
+    order_info = order_queue.get_order(order_id)
+    if order_info is None:
+        return jsonify({'error': f'Bestellung {order_id} nicht gefunden'}), 404
+    return jsonify(order_info)
+
+
+@cocktails_bp.route('/order/<int:order_id>/cancel', methods=['POST'])
+def cancel_order(order_id):
+    if not order_queue.cancel(order_id):
+        return jsonify({'error': f'Bestellung {order_id} kann nicht abgebrochen werden'}), 409
+    return jsonify({'success': True, 'order_id': order_id})
+
+
+@cocktails_bp.route('/queue', methods=['GET'])
+def get_queue():
+    return jsonify(order_queue.get_status())
+
+
 @cocktails_bp.route('/status', methods=['GET'])
 def get_status():
     all_cocktails = db.get_available_cocktails()
     return jsonify({
         'is_mixing': pump_controller.is_mixing,
+        'queue_depth': order_queue.depth,
         'total_cocktails': len(all_cocktails),
         'alcoholic_cocktails': len(db.get_alcoholic_cocktails()),
         'non_alcoholic_cocktails': len(db.get_non_alcoholic_cocktails()),
+        'menu_cache': db.get_cache_stats(),
+    })
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Statistics
+# ─────────────────────────────────────────────────────────────────────────────
+
+MAX_STATS_HOURS = 24 * 365
+
+
+def _stats_hours():
+    hours = request.args.get('hours', 24, type=int)
+    return min(max(hours, 1), MAX_STATS_HOURS)
+
+
+@cocktails_bp.route('/stats/orders', methods=['GET'])
+def get_order_stats():
+    """Bestellungen pro Stunde: ?hours=24"""
+    return jsonify(db.get_orders_per_hour(_stats_hours()))
+
+
+@cocktails_bp.route('/stats/consumption', methods=['GET'])
+def get_consumption_stats():
+    return jsonify(db.get_consumption(_stats_hours()))
+
+
+@cocktails_bp.route('/stats/latency', methods=['GET'])
+def get_latency_stats():
+    return jsonify(db.get_mix_latency(_stats_hours()))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Live status (Server-Sent Events)
+# ─────────────────────────────────────────────────────────────────────────────
+
+SSE_HEARTBEAT_SEC = 15
+
+
+def _sse(event_type, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event_type}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+@cocktails_bp.route('/events', methods=['GET'])
+def stream_events():
+    """Event-Stream: zuerst ein Snapshot, danach nur noch Deltas (pump, mix, mix_progress, levels, order, stock_alert)."""
+    sub = event_bus.subscribe()
+    snapshot = {
+        'is_mixing': pump_controller.is_mixing,
+        'queue': order_queue.get_status(),
+        'ingredients': db.get_ingredients_status(),
+    }
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            yield _sse('snapshot', snapshot)
+            while True:
+                event = sub.get(timeout=SSE_HEARTBEAT_SEC)
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield _sse(event['type'], dict(event['data'], time=event['time']), event['id'])
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
 
 
@@ -71,9 +498,29 @@ def get_status():
 # Ingredients
 # ─────────────────────────────────────────────────────────────────────────────
 
+MAX_BULK_UPDATES = 200
+
+
 @cocktails_bp.route('/ingredients', methods=['GET'])
 def get_ingredients():
-    return jsonify(db.get_ingredients_status())
+    return _cached_json('ingredients', db.get_ingredients_status)
+
+
+@cocktails_bp.route('/ingredients/<int:ingredient_id>/usage', methods=['GET'])
+def get_ingredient_usage(ingredient_id):
+    return jsonify(db.get_ingredient_usage(ingredient_id))
+
+
+@cocktails_bp.route('/ingredients/forecast', methods=['GET'])
+def get_stock_forecast():
+    """Verbrauchsrate, Reichweite und Warnstufe pro Zutat; wie lange jeder Drink noch bestellbar ist."""
+    return jsonify(forecaster.forecast())
+
+
+@cocktails_bp.route('/ingredients/bottlenecks', methods=['GET'])
+def get_bottlenecks():
+    limit = request.args.get('limit', type=int)
+    return jsonify(db.get_bottlenecks(limit))
 
 
 @cocktails_bp.route('/ingredients/set', methods=['POST'])
@@ -116,8 +563,7 @@ def refill_ingredient():
     if not success:
         return jsonify({'error': f'Zutat {ingredient_id} nicht gefunden'}), 404
 
-    ingredients = db.get_ingredients_status()
-    ingredient = next((i for i in ingredients if i['ingredient_id'] == ingredient_id), None)
+    ingredient = db.get_ingredient(ingredient_id)
 
     return jsonify({
         'success': True,
@@ -151,6 +597,48 @@ def refill_all_ingredients():
     })
 
 
+@cocktails_bp.route('/ingredients/bulk', methods=['POST'])
+def update_ingredients_bulk():
+    """POST JSON: {"updates": [{"ingredient_id": 1, "level": 700}, {"ingredient_id": 2, "amount": 200}]}
+
+    Alle Änderungen in einer Transaktion; zurück kommen nur die geänderten Zutaten.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'updates muss eine nicht-leere Liste sein'}), 400
+    if len(updates) > MAX_BULK_UPDATES:
+        return jsonify({'error': f'Höchstens {MAX_BULK_UPDATES} Änderungen pro Anfrage'}), 400
+
+    operations = []
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict) or not isinstance(update.get('ingredient_id'), int):
+            return jsonify({'error': f'updates[{index}]: ingredient_id muss eine Zahl sein'}), 400
+        level, amount = update.get('level'), update.get('amount')
+        if (level is None) == (amount is None):
+            return jsonify({'error': f'updates[{index}]: genau eines von level oder amount angeben'}), 400
+        value = level if level is not None else amount
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return jsonify({'error': f'updates[{index}]: level/amount muss eine Zahl sein'}), 400
+        if level is not None and level < 0:
+            return jsonify({'error': f'updates[{index}]: level darf nicht negativ sein'}), 400
+        operations.append({'ingredient_id': update['ingredient_id'], 'level': level, 'amount': amount})
+
+    result = db.update_ingredients(operations)
+    if result['unknown_ids']:
+        return jsonify({
+            'error': 'Unbekannte Zutaten, nichts geändert',
+            'unknown_ids': result['unknown_ids'],
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'updated_count': len(result['updated']),
+        'ingredients': result['updated'],
+    })
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Pumps
 # ─────────────────────────────────────────────────────────────────────────────
@@ -160,6 +648,16 @@ def test_pump(pump_id):
     success = pump_controller.test_pump(pump_id)
     return jsonify({'success': success, 'pump_id': pump_id})
 
+@cocktails_bp.route('/emergency-stop', methods=['POST'])
+def emergency_stop():
+    cancelled_orders = order_queue.cancel_all()
+    cancelled_pulses = pump_controller.emergency_stop()
+    return jsonify({
+        'success': True,
+        'cancelled_orders': cancelled_orders,
+        'cancelled_pulses': cancelled_pulses,
+    })
+
 @cocktails_bp.route('/pump/<int:pump_id>/start', methods=['POST'])
 def pump_start(pump_id):
     success = pump_controller.start_pump(pump_id)
@@ -171,57 +669,235 @@ def pump_stop(pump_id):
     return jsonify({'success': success, 'pump_id': pump_id})
 
 # ─────────────────────────────────────────────────────────────────────────────
-# PIN management
+# Calibration
 # ─────────────────────────────────────────────────────────────────────────────
 
-import json, os
+@cocktails_bp.route('/calibration', methods=['GET'])
+def get_calibration():
+    return jsonify(pump_controller.get_calibration())
+
+
+@cocktails_bp.route('/calibration/<int:pump_id>/run', methods=['POST'])
+def run_calibration(pump_id):
+    """POST JSON: {"duration_sec": 10}  – danach ausgegebene Menge messen"""
+    data = request.get_json(silent=True) or {}
+    duration_sec = data.get('duration_sec', 10)
+    if not isinstance(duration_sec, (int, float)) or not 0 < duration_sec <= 60:
+        return jsonify({'error': 'duration_sec muss zwischen 0 und 60 liegen'}), 400
+
+    success = pump_controller.run_calibration(pump_id, duration_sec)
+    return jsonify({
+        'success': success,
+        'pump_id': pump_id,
+        'duration_sec': duration_sec,
+        'message': f'Ausgegebene Menge messen und an /api/calibration/{pump_id} senden',
+    })
+
+
+@cocktails_bp.route('/calibration/<int:pump_id>', methods=['POST'])
+def store_calibration(pump_id):
+    """POST JSON: {"measured_ml": 20, "duration_sec": 10, "viscosity_factor": 1.2, "priming_sec": 0.5}"""
+    data = request.get_json(silent=True) or {}
+    if not 0 <= pump_id < pump_controller.pump_count:
+        return jsonify({'error': f'Pumpe {pump_id} nicht gefunden'}), 404
+
+    # priming_sec darf 0 sein, alles andere muss echt positiv sein (0 ergäbe Durchfluss 0)
+    for key in ('measured_ml', 'duration_sec', 'viscosity_factor', 'priming_sec'):
+        value = data.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, (int, float)) or value < 0 or (value == 0 and key != 'priming_sec'):
+            return jsonify({'error': f'{key} muss eine positive Zahl sein'}), 400
+
+    if data.get('viscosity_factor') is not None or data.get('priming_sec') is not None:
+        try:
+            pump_controller.update_calibration(
+                pump_id,
+                viscosity_factor=data.get('viscosity_factor'),
+                priming_sec=data.get('priming_sec'),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    entry = pump_controller.get_calibration(pump_id)
+    if data.get('measured_ml') is not None:
+        try:
+            entry = pump_controller.store_calibration(pump_id, data['measured_ml'], data.get('duration_sec'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if entry is None:
+            return jsonify({'error': f'Kein Kalibrierlauf für Pumpe {pump_id}, duration_sec angeben'}), 400
+
+    return jsonify({'success': True, 'calibration': entry})
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PIN management
+# ─────────────────────────────────────────────────────────────────────────────
 
 ALCOHOL_PIN_FILE = "data/pin.json"
 ADMIN_PIN = "9999"
+DEFAULT_ALCOHOL_PIN = "1234"
+# Wenige Iterationen genügen: gegen Durchprobieren schützt der Limiter, der Hash nur die Datei
+PIN_HASH_ITERATIONS = 20000
+
+# Ein Bucket je Client und Zweck (Admin- bzw. Alkohol-PIN; change-pin zählt zur Alkohol-PIN),
+# damit Gäste am Kiosk (alle 127.0.0.1) mit falschen Alkohol-PINs nicht die Admin-Seite sperren.
+# Mit Hardware-Prozess ersetzt init_app() ihn durch den gemeinsamen Limiter dort.
+pin_limiter = RateLimiter(**PIN_LIMITS)
+
+
+def _hash_pin(pin, salt=None):
+    salt = salt or secrets.token_hex(8)
+    digest = hashlib.pbkdf2_hmac('sha256', pin.encode(), salt.encode(), PIN_HASH_ITERATIONS).hex()
+    return f'pbkdf2_sha256${PIN_HASH_ITERATIONS}${salt}${digest}'
+
+
+def _verify_pin(pin, stored):
+    if not stored:
+        return False
+    try:
+        _, iterations, salt, digest = stored.split('$')
+        candidate = hashlib.pbkdf2_hmac('sha256', pin.encode(), salt.encode(), int(iterations)).hex()
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate, digest)
 
 
 def load_alcohol_pin():
-    if os.path.exists(ALCOHOL_PIN_FILE):
-        try:
-            with open(ALCOHOL_PIN_FILE) as f:
-                p = str(json.load(f).get("alcohol_pin", "1234"))
-                if p.isdigit() and len(p) == 4:
-                    return p
-        except Exception:
-            pass
-    return "1234"
+    """Gespeicherten PIN-Hash laden; Klartext-PINs älterer Versionen werden dabei umgestellt.
+
+    Die Standard-PIN gilt nur, solange es keine PIN-Datei gibt. Eine unlesbare Datei
+    ist ein Fehler (ValueError/OSError), kein stiller Rückfall auf 1234.
+    """
+    if not os.path.exists(ALCOHOL_PIN_FILE):
+        return _hash_pin(DEFAULT_ALCOHOL_PIN)
+    with open(ALCOHOL_PIN_FILE) as f:
+        data = json.load(f)
+    if str(data.get("alcohol_pin_hash", "")).startswith('pbkdf2_sha256$'):
+        return data["alcohol_pin_hash"]
+    p = str(data.get("alcohol_pin", ""))
+    if not (p.isdigit() and len(p) == 4):
+        raise ValueError(f"{ALCOHOL_PIN_FILE} enthält weder PIN-Hash noch gültige PIN")
+    try:
+        stored = save_alcohol_pin(p)
+        print("🔐 Alkohol-PIN wird gehasht gespeichert")
+        return stored
+    except OSError as e:
+        # die PIN aus der Datei gilt trotzdem, nur eben noch im Klartext gespeichert
+        print(f"⚠️ Alkohol-PIN konnte nicht gehasht gespeichert werden: {e}")
+        return _hash_pin(p)
 
 
 def save_alcohol_pin(pin):
-    os.makedirs(os.path.dirname(ALCOHOL_PIN_FILE), exist_ok=True)
-    with open(ALCOHOL_PIN_FILE, "w") as f:
-        json.dump({"alcohol_pin": pin}, f)
+    """PIN gehasht speichern (atomar ersetzt) und den Hash zurückgeben."""
+    stored = _hash_pin(pin)
+    directory = os.path.dirname(ALCOHOL_PIN_FILE)
+    os.makedirs(directory, exist_ok=True)
+    # eigener Temp-Name je Aufruf: mehrere Worker stellen beim Start gleichzeitig um
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.pin.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"alcohol_pin_hash": stored}, f)
+        os.replace(tmp, ALCOHOL_PIN_FILE)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return stored
+
+
+ALCOHOL_PIN_HASH = None     # wird beim Start im Hintergrund geladen
+_pin_file_stamp = None      # Stand von pin.json beim letzten Laden
+
+
+def _pin_stamp():
+    try:
+        stat = os.stat(ALCOHOL_PIN_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+def _load_pin():
+    global ALCOHOL_PIN_HASH, _pin_file_stamp
+    stamp = _pin_stamp()    # vorher: eine Änderung während des Ladens wird beim nächsten Mal gelesen
+    ALCOHOL_PIN_HASH = load_alcohol_pin()
+    _pin_file_stamp = stamp
+
+
+def _alcohol_pin_hash():
+    """Aktueller PIN-Hash; pin.json wird neu gelesen, wenn ein anderer Worker sie geändert hat."""
+    global _pin_file_stamp
+    stamp = _pin_stamp()
+    if stamp != _pin_file_stamp:
+        try:
+            _load_pin()
+        except (OSError, ValueError) as e:
+            _pin_file_stamp = stamp     # bisherige PIN gilt weiter, Warnung nur einmal
+            print(f"⚠️ {ALCOHOL_PIN_FILE} nicht lesbar, bisherige Alkohol-PIN bleibt gültig: {e}")
+    return ALCOHOL_PIN_HASH
+
 
+def _pin_client(purpose):
+    return request.remote_addr, purpose
 
-CURRENT_ALCOHOL_PIN = load_alcohol_pin()
+
+def _throttle_pin_attempt(purpose):
+    """429-Antwort, wenn der Client gerade keine PIN-Versuche für purpose machen darf, sonst None."""
+    allowed, retry_after = pin_limiter.acquire(_pin_client(purpose))
+    if allowed:
+        return None
+    metrics.inc('cocktail_pin_attempts_rejected_total', endpoint=request.endpoint)
+    retry_after = math.ceil(retry_after)
+    response = jsonify({'error': f'Zu viele PIN-Versuche, bitte in {retry_after}s erneut versuchen',
+                        'retry_after_sec': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
+def _record_pin_result(purpose, valid):
+    if valid:
+        pin_limiter.record_success(_pin_client(purpose))
+        return
+    lockout = pin_limiter.record_failure(_pin_client(purpose))
+    if lockout:
+        print(f"🔒 PIN-Eingabe ({purpose}) für {request.remote_addr} {lockout:.0f}s gesperrt")
 
 
 @cocktails_bp.route('/check-pin', methods=['POST'])
 def check_pin():
     """POST JSON: {"pin": "1234", "purpose": "alcohol"|"admin"}"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    purpose = 'admin' if data and str(data.get('purpose')) == 'admin' else 'alcohol'
+    throttled = _throttle_pin_attempt(purpose)
+    if throttled:
+        return throttled
+
     if not data or 'pin' not in data:
         return jsonify({'error': 'PIN erforderlich'}), 400
 
     pin = str(data.get('pin'))
-    purpose = str(data.get('purpose', 'alcohol'))
 
     if not pin.isdigit() or len(pin) != 4:
         return jsonify({'error': 'PIN muss 4 Ziffern sein'}), 400
 
-    is_valid = (pin == ADMIN_PIN) if purpose == 'admin' else (pin == CURRENT_ALCOHOL_PIN)
+    if purpose == 'admin':
+        is_valid = hmac.compare_digest(pin, ADMIN_PIN)
+    else:
+        is_valid = _verify_pin(pin, _alcohol_pin_hash())
+    _record_pin_result(purpose, is_valid)
     return jsonify({'valid': is_valid, 'message': 'PIN korrekt' if is_valid else 'PIN falsch'})
 
 
 @cocktails_bp.route('/change-pin', methods=['POST'])
 def change_pin():
     """POST JSON: {"old_pin": "1234", "new_pin": "5678"}"""
-    global CURRENT_ALCOHOL_PIN
+    global ALCOHOL_PIN_HASH, _pin_file_stamp
+
+    throttled = _throttle_pin_attempt('alcohol')
+    if throttled:
+        return throttled
 
     data = request.get_json()
     if not data or 'old_pin' not in data or 'new_pin' not in data:
@@ -233,9 +909,14 @@ def change_pin():
         return jsonify({'error': 'Alte PIN muss 4 Ziffern sein'}), 400
     if not new_pin.isdigit() or len(new_pin) != 4:
         return jsonify({'error': 'Neue PIN muss 4 Ziffern sein'}), 400
-    if old_pin != CURRENT_ALCOHOL_PIN:
+    valid = _verify_pin(old_pin, _alcohol_pin_hash())
+    _record_pin_result('alcohol', valid)
+    if not valid:
         return jsonify({'success': False, 'message': 'Alte PIN falsch'}), 401
 
-    CURRENT_ALCOHOL_PIN = new_pin
-    save_alcohol_pin(new_pin)
-    return jsonify({'success': True, 'message': 'PIN erfolgreich geändert'})
\ No newline at end of file
+    try:
+        ALCOHOL_PIN_HASH = save_alcohol_pin(new_pin)
+        _pin_file_stamp = _pin_stamp()
+    except OSError as e:
+        return jsonify({'success': False, 'error': f'PIN konnte nicht gespeichert werden: {e}'}), 500
+    return jsonify({'success': True, 'message': 'PIN erfolgreich geändert'})
@@ -0,0 +1,104 @@
+"""Serialisierung der Menü-Antworten.
+
+Vollständig: jeder Drink bringt seine Zutaten mit (Namen, Flags, Anleitungen).
+Kompakt (?compact=1): Zutaten stehen einmal im Wörterbuch 'ingredients', die
+Drinks verweisen nur noch per ID und Menge darauf; image_path und pump_id lassen
+sich aus Name bzw. ID ableiten und entfallen. ?fields=id,name,… wählt Felder aus.
+image_url bildet image_path auf eine andere URL ab (Hash-Namen aus api/assets.py).
+
+Kodiert wird mit orjson, falls installiert, sonst mit json ohne Leerzeichen.
+"""
+import json
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DRINK_FIELDS = ('id', 'name', 'image_path', 'alkoholisch', 'description', 'glass_size_ml',
+                'liquid_recipe', 'manual_ingredients', 'requires_manual_steps')
+# Pflichtfeld bei Feldauswahl: ohne ID kann das Frontend nicht bestellen
+ALWAYS_FIELDS = ('id',)
+IMAGE_PATTERN = '../images/{name}.png'
+
+
+def dumps(obj):
+    """Objekt als UTF-8-JSON (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def parse_fields(value):
+    """?fields=… in ein sortiertes Tupel bekannter Felder umwandeln (None = alle).
+
+    Wirft ValueError bei unbekannten Feldern.
+    """
+    if not value:
+        return None
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = fields - set(DRINK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unbekannte Felder: {', '.join(sorted(unknown))} (möglich: {', '.join(DRINK_FIELDS)})")
+    return tuple(field for field in DRINK_FIELDS if field in fields or field in ALWAYS_FIELDS)
+
+
+def full_menu(drinks, fields=None, image_url=None):
+    if image_url is not None and (fields is None or 'image_path' in fields):
+        drinks = [dict(drink, image_path=image_url(drink['image_path'])) for drink in drinks]
+    if fields is None:
+        return drinks
+    return [{field: drink[field] for field in fields} for drink in drinks]
+
+
+def compact_menu(drinks, fields=None, image_url=None):
+    """{'ingredients': {id: {...}}, 'drinks': [...]} mit Rezepten als [ingredient_id, Menge].
+
+    Mit image_url lassen sich die Bild-URLs nicht mehr aus dem Namen ableiten und
+    bleiben beim Drink.
+    """
+    fields = fields or DRINK_FIELDS
+    ingredients = {}
+    compact = []
+    for drink in drinks:
+        entry = {}
+        for field in fields:
+            if field == 'image_path':
+                if image_url is not None:
+                    entry['image_path'] = image_url(drink['image_path'])
+                continue
+            if field == 'liquid_recipe':
+                entry['liquid_recipe'] = [[ing['ingredient_id'], ing['amount_ml']] for ing in drink['liquid_recipe']]
+            elif field == 'manual_ingredients':
+                # Anleitung hängt von der Menge ab und bleibt deshalb beim Drink
+                entry['manual_ingredients'] = [[ing['ingredient_id'], ing['amount_ml'], ing['instruction']]
+                                               for ing in drink['manual_ingredients']]
+            else:
+                entry[field] = drink[field]
+        compact.append(entry)
+
+        if 'liquid_recipe' in fields or 'manual_ingredients' in fields:
+            for ing in drink['liquid_recipe'] + drink['manual_ingredients']:
+                if ing['ingredient_id'] not in ingredients:
+                    ingredients[ing['ingredient_id']] = {'name': ing['ingredient_name'],
+                                                         'is_liquid': ing['is_liquid']}
+    menu = {'drinks': compact, 'ingredients': ingredients}
+    if 'image_path' in fields and image_url is None:
+        menu['image_pattern'] = IMAGE_PATTERN
+    return menu
+
+
+class FastJSONProvider(JSONProvider):
+    """jsonify() über dumps(); ohne orjson bleibt Flasks Standard-Provider aktiv."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
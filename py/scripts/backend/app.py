@@ -1,26 +1,48 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from api.cocktails import cocktails_bp
+from api import assets, cocktails
 
-app = Flask(__name__)
-CORS(app)
 
-# API-Routes registrieren
-app.register_blueprint(cocktails_bp, url_prefix='/api')
+def create_app():
+    """App anlegen; schwere Initialisierung läuft im Hintergrund (siehe cocktails.init_app)."""
+    app = Flask(__name__)
+    CORS(app)
+
+    # API-Routes registrieren und Dienste starten
+    cocktails.init_app(app)
+    assets.init_app(app)     # Frontend unter /ui/
+    app.add_url_rule('/', 'home', home)
+    return app
+
 
-@app.route('/')
 def home():
     return jsonify({
         'message': 'Cocktail-Maschine Backend 🍸',
         'version': '2.0.0',
         'endpoints': {
             'cocktails': '/api/cocktails',
+            'cocktails_compact': '/api/cocktails?compact=1&fields=id,name,liquid_recipe',
             'alcoholic': '/api/cocktails/alcoholic',
             'non_alcoholic': '/api/cocktails/non-alcoholic',
             'ingredients': '/api/ingredients',
+            'ingredients_bulk': '/api/ingredients/bulk',
+            'stock_forecast': '/api/ingredients/forecast',
+            'mix_plan': '/api/cocktails/<cocktail_id>/plan',
+            'portions': '/api/cocktails/<cocktail_id>/portions',
             'order': '/api/order',
+            'order_status': '/api/order/<order_id>',
+            'queue': '/api/queue',
             'status': '/api/status',
+            'events': '/api/events',
+            'stats': '/api/stats/orders',
+            'metrics': '/api/metrics',
             'test_pump': '/api/test-pump/<pump_id>',
+            'emergency_stop': '/api/emergency-stop',
+            'calibration': '/api/calibration',
+            'liveness': '/api/health/live',
+            'readiness': '/api/health/ready',
+            'frontend': '/ui/',
+            'admin_frontend': '/ui/admin',
             'check_pin': '/api/check-pin',     
             'change_pin': '/api/change-pin'
         },
@@ -31,6 +53,9 @@ def home():
         ]
     })
 
+
+app = create_app()
+
 if __name__ == '__main__':
     print("🚀 Starte Cocktail-Maschine Backend v2.0...")
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,237 @@
+"""Last-Test für die Flask-API gegen eine generierte Datenbank.
+
+Aufruf aus py/scripts/backend:
+
+    python -m benchmarks.load_test --drinks 300 --ingredients 40 --duration 20 --clients 8
+
+Startet app.py in einem Thread-Server mit tausendfach verkürzten Pumpenzeiten
+(COCKTAIL_PUMP_TIME_SCALE=0.001) und meldet p50/p95/p99-Latenz, Requests/s und
+SQL-Anweisungen pro Request je Endpunkt. Danach wird gewartet, bis alle Bestellungen
+gemixt sind; ihr Endstatus kommt aus dem Bestell-Log. Schlägt eine fehl oder bleibt
+eine hängen, endet der Test mit Exit-Code 1 – HTTP 200 allein heißt nur „angenommen“.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from database import migrations
+from database.fixtures import generate_menu
+
+# Anteil der Requests je Endpunkt (entspricht grob mehreren Kiosk-Tablets plus Bestellungen)
+DEFAULT_MIX = {
+    'GET /api/cocktails': 35,
+    'GET /api/cocktails?alkoholisch=false': 10,
+    'GET /api/status': 30,
+    'GET /api/ingredients': 15,
+    'POST /api/order': 10,
+}
+# Pumpenzeiten verkürzt, aber nicht 0: Impulse laufen wirklich durch den Pulse-Engine
+PUMP_TIME_SCALE = '0.001'
+DRAIN_TIMEOUT_SEC = 60
+
+
+def generate_database(path, drink_count, ingredient_count, seed=42):
+    """Neue Datenbank mit aktuellem Schema und synthetischer Karte (siehe database.fixtures)."""
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    generate_menu(conn, drink_count, ingredient_count, seed)
+    conn.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class QueryCounter:
+    """Zählt SQL-Anweisungen pro Endpunkt über den Statement-Hook der Datenbank."""
+
+    COUNTED = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counts = defaultdict(int)
+
+    def set_endpoint(self, endpoint):
+        self._local.endpoint = endpoint
+
+    def __call__(self, sql):
+        if sql.lstrip().upper().startswith(self.COUNTED):
+            endpoint = getattr(self._local, 'endpoint', None) or 'background'
+            with self._lock:
+                self.counts[endpoint] += 1
+
+
+def order_outcomes(db_path):
+    """{status: Anzahl} aller Bestellungen im Bestell-Log."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute('SELECT status, COUNT(*) FROM orders GROUP BY status').fetchall())
+    finally:
+        conn.close()
+
+
+def wait_for_orders(db_path, timeout):
+    """Warten, bis keine Bestellung mehr offen ist (im Bestell-Log 'queued' bis zum Endstatus).
+
+    Rückgabe: {status: Anzahl}; offene Bestellungen stehen nach dem Timeout noch als 'queued' drin.
+    """
+    deadline = time.perf_counter() + timeout
+    outcomes = order_outcomes(db_path)
+    while outcomes.get('queued') and time.perf_counter() < deadline:
+        time.sleep(0.1)
+        outcomes = order_outcomes(db_path)
+    return outcomes
+
+
+def run_client(port, deadline, mix, drink_ids, results, seed):
+    rng = random.Random(seed)
+    endpoints, weights = zip(*mix.items())
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        method, path = endpoint.split(' ', 1)
+        body, headers = None, {}
+        if method == 'POST':
+            body = json.dumps({'cocktail_id': rng.choice(drink_ids)})
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            status = 0
+        results[endpoint].append((time.perf_counter() - start, status))
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drinks', type=int, default=300)
+    parser.add_argument('--ingredients', type=int, default=40)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0, help='Messdauer in Sekunden')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--json', dest='json_path', help='Ergebnisse zusätzlich als JSON schreiben')
+    parser.add_argument('--max-p95-ms', type=float, help='Exit-Code 1, wenn ein Endpunkt darüber liegt')
+    parser.add_argument('--verbose', action='store_true', help='Server-Ausgaben nicht unterdrücken')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='cocktail-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    generate_database(db_path, args.drinks, args.ingredients)
+    os.environ['COCKTAIL_DB_PATH'] = db_path
+    os.environ['COCKTAIL_PUMP_TIME_SCALE'] = PUMP_TIME_SCALE
+
+    with contextlib.ExitStack() as quiet:
+        if not args.verbose:
+            # nach /dev/null statt in einen Puffer, der mit jeder Bestellung wächst
+            devnull = quiet.enter_context(open(os.devnull, 'w'))
+            quiet.enter_context(contextlib.redirect_stdout(devnull))
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        from werkzeug.serving import make_server
+        from app import app
+        from api import cocktails
+
+        counter = QueryCounter()
+        cocktails.db.set_statement_hook(counter)
+
+        @app.before_request
+        def _tag_endpoint():
+            from flask import request
+            path = request.full_path.rstrip('?')
+            counter.set_endpoint(f'{request.method} {path}')
+
+        server = make_server('127.0.0.1', args.port, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        drink_ids = [d['id'] for d in cocktails.db.get_available_cocktails()]
+        warm = defaultdict(list)
+        run_client(args.port, time.perf_counter() + args.warmup, DEFAULT_MIX, drink_ids, warm, seed=0)
+        counter.counts.clear()
+
+        results = defaultdict(list)
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=run_client, args=(args.port, deadline, DEFAULT_MIX, drink_ids, results, i + 1))
+            for i in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        outcomes = wait_for_orders(db_path, DRAIN_TIMEOUT_SEC)
+
+    report = {}
+    for endpoint in DEFAULT_MIX:
+        samples = results.get(endpoint, [])
+        latencies = sorted(s[0] * 1000 for s in samples)
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[status] += 1
+        report[endpoint] = {
+            'requests': len(samples),
+            'rps': len(samples) / elapsed,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'queries_per_request': counter.counts.get(endpoint, 0) / len(samples) if samples else 0.0,
+            'status_codes': dict(statuses),
+        }
+    total = sum(r['requests'] for r in report.values())
+
+    print(f"\n🍸 Last-Test: {args.drinks} Drinks, {args.ingredients} Zutaten, "
+          f"{args.clients} Clients, {elapsed:.1f}s")
+    print(f"{'Endpunkt':40} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8}")
+    for endpoint, r in report.items():
+        print(f"{endpoint:40} {r['requests']:7d} {r['rps']:8.1f} {r['p50_ms']:8.2f} "
+              f"{r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['queries_per_request']:8.2f}")
+    print(f"{'Gesamt':40} {total:7d} {total / elapsed:8.1f}")
+    print(f"Hintergrund-SQL (Mix-Threads): {counter.counts.get('background', 0)}")
+    print("Bestellungen (inkl. Aufwärmphase): " + (', '.join(
+        f"{status} {count}" for status, count in sorted(outcomes.items())) or 'keine'))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'config': vars(args), 'elapsed_sec': elapsed, 'endpoints': report,
+                       'orders': outcomes}, f, indent=2)
+
+    exit_code = 0
+    if outcomes.get('failed'):
+        print(f"❌ {outcomes['failed']} Bestellung(en) fehlgeschlagen")
+        exit_code = 1
+    if outcomes.get('queued'):
+        print(f"❌ {outcomes['queued']} Bestellung(en) nach {DRAIN_TIMEOUT_SEC}s nicht fertig")
+        exit_code = 1
+    if args.max_p95_ms is not None:
+        slow = [e for e, r in report.items() if r['p95_ms'] > args.max_p95_ms]
+        if slow:
+            print(f"❌ p95 über {args.max_p95_ms}ms: {', '.join(slow)}")
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import threading
+import time
+
+CALIBRATION_FILE = "data/calibration.json"
+DEFAULT_FLOW_ML_PER_SEC = 2.0
+
+
+class PumpCalibration:
+    """Persistierte Durchflusstabelle pro Pumpe.
+
+    Laufzeit einer Pumpe = priming_sec + amount_ml / flow_ml_per_sec * viscosity_factor.
+    priming_sec ist die Zeit, bis die Flüssigkeit den Auslass erreicht (Schlauch füllen),
+    viscosity_factor > 1 für Sirupe und dickflüssige Säfte.
+    """
+
+    def __init__(self, pump_count, path=CALIBRATION_FILE):
+        self.pump_count = pump_count
+        self.path = path
+        self._lock = threading.Lock()
+        self._table = {pump_id: self._default_entry() for pump_id in range(pump_count)}
+        self.load()
+
+    @staticmethod
+    def _default_entry():
+        return {
+            'flow_ml_per_sec': DEFAULT_FLOW_ML_PER_SEC,
+            'viscosity_factor': 1.0,
+            'priming_sec': 0.0,
+            'calibrated_at': None,
+        }
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f).get('pumps', {})
+            entries = {}
+            for key, entry in stored.items():
+                pump_id = int(key)
+                if pump_id in self._table:
+                    entries[pump_id] = self._parse_entry(
+                        {k: v for k, v in entry.items() if k in self._table[pump_id]}
+                    )
+        except Exception as e:
+            print(f"⚠️ Kalibrierung {self.path} nicht lesbar: {e}")
+            return
+        with self._lock:
+            for pump_id, entry in entries.items():
+                self._table[pump_id].update(entry)
+
+    @staticmethod
+    def _parse_entry(entry):
+        """Von Hand bearbeitete Datei: Zahlen wie in update() umwandeln und dieselben Grenzen prüfen."""
+        for key in ('flow_ml_per_sec', 'viscosity_factor', 'priming_sec'):
+            if key in entry:
+                entry[key] = float(entry[key])
+                if not math.isfinite(entry[key]):
+                    raise ValueError(f'{key} muss eine endliche Zahl sein')
+        for key in ('flow_ml_per_sec', 'viscosity_factor'):
+            if key in entry and not entry[key] > 0:
+                raise ValueError(f'{key} muss größer als 0 sein')
+        if 'priming_sec' in entry and not entry['priming_sec'] >= 0:
+            raise ValueError('priming_sec darf nicht negativ sein')
+        return entry
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {'pumps': {str(pump_id): entry for pump_id, entry in self._table.items()}}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, pump_id):
+        with self._lock:
+            return dict(self._table[pump_id], pump_id=pump_id)
+
+    def to_list(self):
+        return [self.get(pump_id) for pump_id in range(self.pump_count)]
+
+    def duration_for(self, pump_id, amount_ml):
+        """Exakte Laufzeit in Sekunden für amount_ml auf dieser Pumpe."""
+        if amount_ml <= 0:
+            return 0.0
+        entry = self._table[pump_id]
+        return entry['priming_sec'] + amount_ml / entry['flow_ml_per_sec'] * entry['viscosity_factor']
+
+    def update(self, pump_id, flow_ml_per_sec=None, viscosity_factor=None, priming_sec=None):
+        """Einzelne Werte setzen und speichern.
+
+        Wirft ValueError bei Durchfluss oder Viskositätsfaktor <= 0 (die Pumpe
+        würde nie fördern bzw. die Laufzeit wäre nicht berechenbar) und negativer Vorlaufzeit.
+        """
+        if flow_ml_per_sec is not None and not float(flow_ml_per_sec) > 0:
+            raise ValueError('flow_ml_per_sec muss größer als 0 sein')
+        if viscosity_factor is not None and not float(viscosity_factor) > 0:
+            raise ValueError('viscosity_factor muss größer als 0 sein')
+        if priming_sec is not None and not float(priming_sec) >= 0:
+            raise ValueError('priming_sec darf nicht negativ sein')
+        with self._lock:
+            entry = self._table[pump_id]
+            if flow_ml_per_sec is not None:
+                entry['flow_ml_per_sec'] = float(flow_ml_per_sec)
+            if viscosity_factor is not None:
+                entry['viscosity_factor'] = float(viscosity_factor)
+            if priming_sec is not None:
+                entry['priming_sec'] = float(priming_sec)
+            entry['calibrated_at'] = time.time()
+        self.save()
+        return self.get(pump_id)
+
+    def record_measurement(self, pump_id, run_sec, measured_ml):
+        """Aus einem Testlauf (Laufzeit, gemessene Menge) den Durchfluss ableiten.
+
+        Der Durchfluss wird so gewählt, dass duration_for(measured_ml) == run_sec ergibt –
+        die gemessene Flüssigkeit bringt ihre Viskosität also schon mit.
+        """
+        entry = self.get(pump_id)
+        pumping_sec = run_sec - entry['priming_sec']
+        if measured_ml <= 0 or pumping_sec <= 0:
+            raise ValueError('Messung muss eine positive Menge nach der Vorlaufzeit ergeben')
+        flow = measured_ml * entry['viscosity_factor'] / pumping_sec
+        return self.update(pump_id, flow_ml_per_sec=flow)
@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+
+SEVERITY = {None: 0, 'warning': 1, 'critical': 2}
+
+
+class StockForecaster:
+    """Verbrauchsprognose pro Zutat und Warnung, bevor eine Flasche mitten im Betrieb leer läuft.
+
+    Verbrauchsrate = exponentiell gewichtete Summe der letzten Bestellungen:
+    rate = Σ ml · e^(-Alter/τ) / τ. Quelle ist das Bestell-Log der Datenbank,
+    damit alle Worker-Prozesse dieselbe Rate sehen.
+    """
+
+    def __init__(self, db, events=None, tau_sec=1800, horizon_sec=1200, critical_servings=2, cache_sec=5.0):
+        self.db = db
+        self.events = events
+        self.tau_sec = tau_sec                    # Zeitkonstante der Gewichtung
+        self.horizon_sec = horizon_sec            # Warnung, wenn eine Zutat früher leer ist
+        self.critical_servings = critical_servings
+        self.cache_sec = cache_sec
+        self._lock = threading.Lock()
+        self._cached_at = None
+        self._rates = {}          # ingredient_id -> ml/s
+        self._thirstiest = {}     # ingredient_id -> größte Menge, die ein Drink davon braucht
+        self._names = {}
+        self._alerts = {}         # ingredient_id -> aktuelle Warnstufe
+        # check() läuft im Schreibpfad (auch bei /api/order): Füllstände nur vormerken,
+        # geprüft wird in einem Hintergrund-Thread
+        self._pending = {}        # ingredient_id -> zuletzt gemeldeter Füllstand
+        self._pending_cond = threading.Condition()
+        self._worker = None
+
+    def rates(self):
+        """Aktuelle Verbrauchsrate pro Zutat in ml/s (höchstens alle cache_sec neu berechnet)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._cached_at is None or now - self._cached_at > self.cache_sec:
+                self._refresh()
+                self._cached_at = now
+            return self._rates
+
+    def forecast(self):
+        """Reichweite jeder Zutat und wie lange jeder Drink noch bestellbar ist."""
+        rates = self.rates()
+        ingredients = []
+        levels = {}
+        for ing in self.db.get_ingredients_status():
+            ing_id, level = ing['ingredient_id'], ing['current_level']
+            levels[ing_id] = level
+            rate = rates.get(ing_id, 0.0)
+            ingredients.append({
+                'ingredient_id': ing_id,
+                'ingredient_name': ing['ingredient_name'],
+                'current_level': level,
+                'consumption_ml_per_hour': round(rate * 3600, 1),
+                'empty_in_sec': round(level / rate) if rate > 0 else None,
+                'servings_left': self._servings(ing_id, level),
+                'alert': self._alert_level(ing_id, level, rate),
+            })
+
+        drinks = []
+        for drink_id, name, requirements in self.db.get_drink_requirements():
+            servings, limiting, unavailable_in = None, None, None
+            for ing_id, amount in requirements:
+                if amount <= 0:
+                    continue
+                level = levels.get(ing_id, 0)
+                n = int(level // amount)
+                if servings is None or n < servings:
+                    servings, limiting = n, ing_id
+                rate = rates.get(ing_id, 0.0)
+                if rate > 0:
+                    # nicht mehr bestellbar, sobald weniger als eine Portion übrig ist
+                    t = max(0.0, level - amount) / rate if level >= amount else 0.0
+                    unavailable_in = t if unavailable_in is None else min(unavailable_in, t)
+            drinks.append({
+                'drink_id': drink_id,
+                'name': name,
+                'servings': servings,
+                'limiting_ingredient_id': limiting,
+                'unavailable_in_sec': round(unavailable_in) if unavailable_in is not None else None,
+            })
+        drinks.sort(key=lambda d: (d['unavailable_in_sec'] is None, d['unavailable_in_sec'] or 0, d['servings'] or 0))
+        return {'ingredients': ingredients, 'drinks': drinks, 'tau_sec': self.tau_sec,
+                'horizon_sec': self.horizon_sec}
+
+    def check(self, levels):
+        """Listener für CocktailDatabase: Füllstände zur Prüfung im Hintergrund vormerken."""
+        with self._pending_cond:
+            self._pending.update(levels)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True, name='stock-forecast')
+                self._worker.start()
+            self._pending_cond.notify()
+
+    # -------------------------------------------------------------------------
+    # Intern
+    # -------------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+                levels, self._pending = self._pending, {}
+            try:
+                self._check(levels)
+            except Exception as e:
+                print(f"⚠️ Verbrauchsprognose fehlgeschlagen: {e}")
+
+    def _check(self, levels):
+        """Warnung senden, wenn eine Zutat eine höhere Warnstufe erreicht (Rate aus dem Cache)."""
+        rates = self.rates()
+        for ing_id, level in levels.items():
+            rate = rates.get(ing_id, 0.0)
+            alert = self._alert_level(ing_id, level, rate)
+            with self._lock:
+                previous = self._alerts.get(ing_id)
+                self._alerts[ing_id] = alert
+            if SEVERITY[alert] <= SEVERITY[previous]:
+                continue   # schon gemeldet, oder nach dem Auffüllen zurückgesetzt
+            empty_in = round(level / rate) if rate > 0 else None
+            name = self._names.get(ing_id, f'#{ing_id}')
+            when = f"in ~{empty_in // 60} min leer" if empty_in is not None else "fast leer"
+            print(f"⚠️ Nachfüllen: {name} {when} (noch {level}ml)")
+            if self.events is not None:
+                self.events.publish('stock_alert', {
+                    'ingredient_id': ing_id,
+                    'ingredient_name': name,
+                    'level': alert,
+                    'current_level': level,
+                    'empty_in_sec': empty_in,
+                    'servings_left': self._servings(ing_id, level),
+                })
+
+    def _refresh(self):
+        """Aufrufer hält self._lock."""
+        now = time.time()
+        rates = {}
+        # nach 5 τ ist das Gewicht unter 1 % – ältere Bestellungen müssen nicht gelesen werden
+        for ing_id, amount, ordered_at in self.db.get_recent_consumption(5 * self.tau_sec):
+            weight = math.exp(-max(0.0, now - ordered_at) / self.tau_sec)
+            rates[ing_id] = rates.get(ing_id, 0.0) + amount * weight / self.tau_sec
+        self._rates = {ing_id: max(0.0, rate) for ing_id, rate in rates.items()}
+
+        thirstiest = {}
+        for _, _, requirements in self.db.get_drink_requirements():
+            for ing_id, amount in requirements:
+                thirstiest[ing_id] = max(thirstiest.get(ing_id, 0), amount)
+        self._thirstiest = thirstiest
+        self._names = {ing['ingredient_id']: ing['ingredient_name'] for ing in self.db.get_ingredients_status()}
+
+    def _servings(self, ing_id, level):
+        amount = self._thirstiest.get(ing_id)
+        return int(level // amount) if amount else None
+
+    def _alert_level(self, ing_id, level, rate):
+        servings = self._servings(ing_id, level)
+        if servings is not None and servings < self.critical_servings:
+            return 'critical'
+        if rate > 0 and level / rate < self.horizon_sec:
+            return 'warning'
+        return None
@@ -0,0 +1,202 @@
+"""Hardware-Besitzer-Prozess für den Produktionsbetrieb.
+
+Genau ein Prozess besitzt die GPIO-Pins (PumpController + OrderQueue). Die
+HTTP-Worker sprechen ihn über einen Unix-Socket an (multiprocessing.connection,
+mit authkey) und bekommen seine Live-Events weitergereicht.
+"""
+import functools
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from core.order_queue import OrderQueue
+from core.pump_controller import PumpController
+from database.cocktail_db import CocktailDatabase
+from utils.events import EventBus
+from utils.metrics import registry as metrics
+from utils.rate_limit import PIN_LIMITS, RateLimiter
+
+# Öffentliche Aufrufe, die Worker ausführen dürfen (Methoden und lesbare Attribute)
+EXPOSED = {
+    'pump_controller': {
+        'is_mixing', 'pump_count', 'max_lateness_sec', 'test_pump', 'start_pump', 'stop_pump',
+        'emergency_stop', 'estimate_duration', 'pump_duration', 'run_calibration', 'store_calibration',
+        'get_calibration', 'update_calibration', 'plan_mix',
+    },
+    'order_queue': {'submit', 'get_order', 'get_status', 'cancel', 'cancel_all', 'depth'},
+    'pin_limiter': {'acquire', 'record_failure', 'record_success', 'stats'},
+    'service': {'ping', 'render_metrics'},
+}
+
+
+class HardwareService:
+    """Besitzt PumpController und OrderQueue und beantwortet RPC-Aufrufe der Worker.
+
+    Außerdem zählt er die PIN-Fehlversuche aller Worker, damit das Limit nicht mit
+    der Worker-Zahl wächst.
+    """
+
+    def __init__(self, address, authkey, db_path='database/mixes.db', time_scale=1.0,
+                 max_concurrent_pumps=None, split_pours=False):
+        self.address = address
+        self.authkey = authkey
+        self.events = EventBus()
+        # Eigene Datenbank-Instanz für Bestell-Log und Rückbuchungen abgebrochener Bestellungen;
+        # die Worker bemerken die Änderung über ihren Fremdschreib-Abgleich.
+        self.db = CocktailDatabase(db_path)
+        self.db.check_schema()
+        self.pump_controller = PumpController(events=self.events, time_scale=time_scale,
+                                              max_concurrent_pumps=max_concurrent_pumps,
+                                              split_pours=split_pours)
+        self.order_queue = OrderQueue(self.pump_controller, on_finished=self._on_order_finished,
+                                      events=self.events)
+        self.pin_limiter = RateLimiter(**PIN_LIMITS)
+        self._targets = {
+            'pump_controller': self.pump_controller,
+            'order_queue': self.order_queue,
+            'pin_limiter': self.pin_limiter,
+            'service': self,
+        }
+
+    def _on_order_finished(self, order, success):
+        refund = () if success else order.unpoured_recipe()
+        if order.log_id is not None:
+            self.db.finish_order(order.log_id, order.status, order.started_at, order.finished_at, refund)
+        elif refund:
+            self.db.restock_recipe(refund)
+
+    def ping(self):
+        return os.getpid()
+
+    def render_metrics(self):
+        return metrics.render()
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)   # verwaister Socket eines früheren Laufs
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            print(f"🔌 Hardware-Service lauscht auf {self.address} (PID {os.getpid()})")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"⚠️ Verbindung abgelehnt: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                target, name, args, kwargs = conn.recv()
+                if (target, name) == ('service', 'subscribe'):
+                    self._stream_events(conn)
+                    return
+                try:
+                    conn.send(('ok', self._call(target, name, args, kwargs)))
+                except Exception as e:
+                    conn.send(('error', e))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _call(self, target, name, args, kwargs):
+        if name not in EXPOSED.get(target, ()):
+            raise AttributeError(f'{target}.{name} ist nicht freigegeben')
+        attr = getattr(self._targets[target], name)
+        return attr(*args, **kwargs) if callable(attr) else attr
+
+    def _stream_events(self, conn):
+        sub = self.events.subscribe()
+        try:
+            while True:
+                event = sub.get(timeout=15)
+                conn.send(event)   # None dient als Keepalive
+        finally:
+            self.events.unsubscribe(sub)
+
+
+def run_hardware_service(address, authkey, db_path='database/mixes.db', time_scale=1.0, **pump_options):
+    service = HardwareService(address, authkey, db_path, time_scale, **pump_options)
+    try:
+        service.serve_forever()
+    finally:
+        service.pump_controller.cleanup()
+
+
+class HardwareClient:
+    """RPC-Client der Worker: eine Verbindung pro Thread, ein Neuversuch bei Verbindungsabbruch."""
+
+    def __init__(self, address, authkey, events=None):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+        self.pump_controller = RemoteProxy(self, 'pump_controller', ('is_mixing', 'pump_count', 'max_lateness_sec'))
+        self.order_queue = RemoteProxy(self, 'order_queue', ('depth',))
+        self.pin_limiter = RemoteProxy(self, 'pin_limiter')
+        if events is not None:
+            threading.Thread(target=self._forward_events, args=(events,), daemon=True,
+                             name='hardware-events').start()
+
+    def call(self, target, name, *args, **kwargs):
+        for attempt in (1, 2):
+            conn = getattr(self._local, 'conn', None)
+            try:
+                if conn is None:
+                    conn = self._local.conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                conn.send((target, name, args, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+        if status == 'error':
+            raise result
+        return result
+
+    def render_metrics(self):
+        return self.call('service', 'render_metrics')
+
+    def _forward_events(self, events):
+        """Events des Hardware-Prozesses in den lokalen EventBus (SSE) einspeisen."""
+        while True:
+            try:
+                with Client(self.address, family='AF_UNIX', authkey=self.authkey) as conn:
+                    conn.send(('service', 'subscribe', (), {}))
+                    while True:
+                        event = conn.recv()
+                        if event is not None:
+                            events.publish(event['type'], event['data'])
+            except (EOFError, OSError):
+                time.sleep(1)   # Hardware-Prozess startet neu oder ist noch nicht bereit
+
+
+class RemoteProxy:
+    """Stellvertreter für PumpController/OrderQueue/PIN-Limiter im Worker-Prozess."""
+
+    def __init__(self, client, target, properties=()):
+        self._client = client
+        self._target = target
+        self._properties = frozenset(properties)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._properties:
+            return self._client.call(self._target, name)
+        return functools.partial(self._client.call, self._target, name)
+
+
+if __name__ == '__main__':
+    # Start durch serve.py: python -m core.hardware_service (Konfiguration per Umgebung,
+    # damit der authkey nicht in der Prozessliste steht)
+    run_hardware_service(
+        os.environ['COCKTAIL_HARDWARE_SOCKET'],
+        os.environ['COCKTAIL_HARDWARE_AUTHKEY'].encode(),
+        os.environ.get('COCKTAIL_DB_PATH', 'database/mixes.db'),
+        float(os.environ.get('COCKTAIL_PUMP_TIME_SCALE', '1')),
+        max_concurrent_pumps=int(os.environ.get('COCKTAIL_MAX_CONCURRENT_PUMPS', '0')),
+        split_pours=os.environ.get('COCKTAIL_SPLIT_POURS', '0') == '1',
+    )
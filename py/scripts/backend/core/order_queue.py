@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class Order:
+    """Eine Bestellung in der Warteschlange."""
+
+    def __init__(self, order_id, cocktail, log_id=None, created_at=None):
+        self.id = order_id
+        self.log_id = log_id            # ID im Bestell-Log der Datenbank
+        self.cocktail = cocktail
+        self.recipe = cocktail['liquid_recipe']
+        self.pumps = frozenset(ing['pump_id'] for ing in self.recipe)
+        self.status = 'queued'          # queued → mixing → done | failed | cancelled
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.duration_sec = 0.0
+        self.poured = {}                # ingredient_id -> tatsächlich geförderte ml
+        self.cancel_requested = False
+
+    def unpoured_recipe(self):
+        """Rezeptzeilen mit den nicht geförderten Restmengen (für die Rückbuchung)."""
+        return [
+            dict(ing, amount_ml=ing['amount_ml'] - self.poured.get(ing['ingredient_id'], 0))
+            for ing in self.recipe
+            if ing['amount_ml'] - self.poured.get(ing['ingredient_id'], 0) > 0
+        ]
+
+    def to_dict(self):
+        return {
+            'order_id': self.id,
+            'cocktail_id': self.cocktail['id'],
+            'cocktail': self.cocktail['name'],
+            'status': self.status,
+            'pumps': sorted(self.pumps),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'estimated_duration_sec': round(self.duration_sec, 1),
+        }
+
+
+class OrderQueue:
+    """FIFO-Warteschlange mit Pumpen-Scheduler.
+
+    Eine Bestellung startet, sobald ein Worker frei ist und keine ihrer Pumpen
+    belegt ist. Spätere Bestellungen dürfen vorbeiziehen, wenn sie keine Pumpe
+    brauchen, auf die eine frühere wartende Bestellung wartet (kein Verhungern).
+    """
+
+    def __init__(self, pump_controller, max_workers=2, max_pending=20, on_finished=None,
+                 history_size=50, events=None, clock=time.time):
+        self.pump_controller = pump_controller
+        self._clock = clock                 # Wanduhr; der Simulator setzt eine virtuelle ein
+        self.events = events
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.on_finished = on_finished
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = deque()
+        self._running = {}                  # order_id -> Order
+        self._busy_pumps = set()
+        self._history = deque(maxlen=history_size)
+        self._orders = {}                   # order_id -> Order (wartend, laufend, Historie)
+
+    def submit(self, cocktail, log_id=None):
+        """Bestellung einreihen. Gibt None zurück, wenn die Warteschlange voll ist."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                return None
+            order = Order(next(self._ids), cocktail, log_id, created_at=self._clock())
+            order.duration_sec = self.pump_controller.estimate_duration(order.recipe)
+            self._pending.append(order)
+            self._orders[order.id] = order
+            self._publish(order)
+            self._dispatch()
+        return order
+
+    def get_order(self, order_id):
+        """Status einer Bestellung inkl. Position und ETA (None, wenn unbekannt)."""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return None
+            return self._describe(order, self._estimate_starts())
+
+    def get_status(self):
+        with self._lock:
+            starts = self._estimate_starts()
+            return {
+                'depth': len(self._pending),
+                'running': len(self._running),
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'busy_pumps': sorted(self._busy_pumps),
+                'orders': [self._describe(o, starts)
+                           for o in itertools.chain(self._running.values(), self._pending)],
+            }
+
+    def cancel(self, order_id):
+        """Wartende Bestellung entfernen oder laufende abbrechen. False, wenn nicht (mehr) möglich."""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None or order.status not in ('queued', 'mixing'):
+                return False
+            order.cancel_requested = True
+            if order.status == 'mixing':
+                running = True
+            else:
+                running = False
+                self._pending.remove(order)
+                self._finish(order, False)
+        if running:
+            self.pump_controller.cancel_mix(order.id)
+        elif self.on_finished:
+            self.on_finished(order, False)
+        return True
+
+    def cancel_all(self):
+        """Alle wartenden und laufenden Bestellungen abbrechen (Not-Aus)."""
+        with self._lock:
+            order_ids = [o.id for o in itertools.chain(self._pending, self._running.values())]
+        return sum(1 for order_id in order_ids if self.cancel(order_id))
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    # -------------------------------------------------------------------------
+    # Scheduling (Aufrufer hält self._lock)
+    # -------------------------------------------------------------------------
+
+    def _dispatch(self):
+        blocked = set()
+        for order in list(self._pending):
+            if len(self._running) >= self.max_workers:
+                break
+            if order.pumps & (self._busy_pumps | blocked):
+                blocked |= order.pumps
+                continue
+            self._pending.remove(order)
+            self._start(order)
+
+    def _start(self, order):
+        order.status = 'mixing'
+        order.started_at = self._clock()
+        self._running[order.id] = order
+        self._busy_pumps |= order.pumps
+        self._publish(order)
+        threading.Thread(target=self._run, args=(order,), daemon=True,
+                         name=f'order-{order.id}').start()
+
+    def _run(self, order):
+        success = False
+        try:
+            success = self.pump_controller.mix_cocktail(
+                order.recipe, order.cocktail['name'], group=order.id, report=order.poured
+            )
+        except Exception as e:
+            print(f"❌ Bestellung {order.id} fehlgeschlagen: {e}")
+        finally:
+            with self._lock:
+                del self._running[order.id]
+                self._busy_pumps -= order.pumps
+                self._finish(order, success)
+                self._dispatch()
+        if self.on_finished:
+            self.on_finished(order, success)
+
+    def _finish(self, order, success):
+        if success:
+            order.status = 'done'
+        else:
+            order.status = 'cancelled' if order.cancel_requested else 'failed'
+        order.finished_at = self._clock()
+        self._archive(order)
+        self._publish(order)
+
+    def _publish(self, order):
+        if self.events is not None:
+            self.events.publish('order', dict(order.to_dict(), queue_depth=len(self._pending)))
+
+    def _archive(self, order):
+        if len(self._history) == self._history.maxlen:
+            self._orders.pop(self._history[0].id, None)
+        self._history.append(order)
+
+    def _estimate_starts(self):
+        """Startzeiten der wartenden Bestellungen simulieren (Pumpen- und Worker-Belegung)."""
+        now = self._clock()
+        pump_free_at = {}
+        workers = []
+        for order in self._running.values():
+            end = max(now, order.started_at + order.duration_sec)
+            for pump in order.pumps:
+                pump_free_at[pump] = end
+            heapq.heappush(workers, end)
+        workers.extend([now] * (self.max_workers - len(workers)))
+        heapq.heapify(workers)
+
+        starts = {}
+        for order in self._pending:
+            worker_free = heapq.heappop(workers)
+            start = max([worker_free] + [pump_free_at.get(p, now) for p in order.pumps])
+            end = start + order.duration_sec
+            for pump in order.pumps:
+                pump_free_at[pump] = end
+            heapq.heappush(workers, end)
+            starts[order.id] = start
+        return starts
+
+    def _describe(self, order, starts):
+        info = order.to_dict()
+        now = self._clock()
+        if order.status == 'queued':
+            info['position'] = self._pending.index(order) + 1
+            start = starts.get(order.id, now)
+            info['eta_sec'] = round(start - now + order.duration_sec, 1)
+        elif order.status == 'mixing':
+            info['position'] = 0
+            info['eta_sec'] = round(max(0.0, order.started_at + order.duration_sec - now), 1)
+        else:
+            info['position'] = None
+            info['eta_sec'] = 0
+        return info
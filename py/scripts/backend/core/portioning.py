@@ -0,0 +1,81 @@
+"""Portionierung: Rezepte auf Glasgröße und Stärke umrechnen.
+
+Die gespeicherten Rezepte sind für ein 350-ml-Glas gedacht. Eine Portion skaliert
+alle flüssigen Zutaten auf das Zielvolumen; die Stärke ändert nur den
+Spirituosen-Anteil, die Filler gleichen aus, damit das Glas voll bleibt.
+Manuelle Zutaten (Limette, Minze, …) bleiben pro Glas unverändert.
+"""
+
+GLASS_SIZES_ML = {
+    'kids': 200,        # nur alkoholfreie Drinks
+    'small': 250,
+    'regular': 350,
+    'large': 450,
+}
+STRENGTHS = {
+    'single': 1.0,
+    'double': 2.0,
+}
+DEFAULT_SIZE = 'regular'
+DEFAULT_STRENGTH = 'single'
+
+# Spirituosen der Pumpenbelegung (die ingredients-Tabelle kennt kein Alkohol-Flag)
+SPIRITS = {'Havana', 'Bacardi Hell', 'Vodka', 'Wodka', 'Gin', 'Tequilla', 'Pitu', 'Whisky'}
+
+
+def is_spirit(ingredient):
+    return ingredient['ingredient_name'] in SPIRITS
+
+
+def portion_options(cocktail):
+    """Sinnvolle (size, strength)-Kombinationen für einen Drink."""
+    sizes = [size for size in GLASS_SIZES_ML if size != 'kids' or not cocktail['alkoholisch']]
+    has_spirits = any(is_spirit(ing) for ing in cocktail['liquid_recipe'])
+    strengths = list(STRENGTHS) if has_spirits else [DEFAULT_STRENGTH]
+    return [(size, strength) for size in sizes for strength in strengths]
+
+
+def scale_cocktail(cocktail, size=None, strength=None):
+    """Kopie des Cocktails mit umgerechnetem liquid_recipe (ganze ml).
+
+    Wirft ValueError bei unbekannter Größe/Stärke, Kindergröße für alkoholische
+    Drinks oder einer Stärke, die mehr Spirituose verlangt, als ins Glas passt.
+    """
+    size = size or DEFAULT_SIZE
+    strength = strength or DEFAULT_STRENGTH
+    if size not in GLASS_SIZES_ML:
+        raise ValueError(f"Unbekannte Größe '{size}' (möglich: {', '.join(GLASS_SIZES_ML)})")
+    if strength not in STRENGTHS:
+        raise ValueError(f"Unbekannte Stärke '{strength}' (möglich: {', '.join(STRENGTHS)})")
+    if size == 'kids' and cocktail['alkoholisch']:
+        raise ValueError('Kindergröße gibt es nur für alkoholfreie Drinks')
+
+    recipe = cocktail['liquid_recipe']
+    base_total = sum(ing['amount_ml'] for ing in recipe)
+    if base_total <= 0:
+        return dict(cocktail, portion={'size': size, 'strength': strength, 'scale': 1.0})
+
+    target_total = GLASS_SIZES_ML[size]
+    scale = target_total / base_total
+    spirits_base = sum(ing['amount_ml'] for ing in recipe if is_spirit(ing))
+    fillers_base = base_total - spirits_base
+
+    spirit_factor = scale * STRENGTHS[strength]
+    if fillers_base > 0:
+        filler_total = target_total - spirits_base * spirit_factor
+        if filler_total < 0:
+            raise ValueError(f'{cocktail["name"]} ist in Größe {size} nicht stärker möglich')
+        filler_factor = filler_total / fillers_base
+    else:
+        filler_factor = spirit_factor   # reine Spirituosen-Drinks werden einfach größer
+
+    scaled = [
+        dict(ing, amount_ml=round(ing['amount_ml'] * (spirit_factor if is_spirit(ing) else filler_factor)))
+        for ing in recipe
+    ]
+    return dict(
+        cocktail,
+        liquid_recipe=[ing for ing in scaled if ing['amount_ml'] > 0],
+        glass_size_ml=target_total,
+        portion={'size': size, 'strength': strength, 'scale': round(scale, 3)},
+    )
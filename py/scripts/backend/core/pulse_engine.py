@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Pulse:
+    """Ein geplanter Pumpenimpuls: EIN bei start_at, AUS bei end_at (monotone Zeit)."""
+
+    def __init__(self, pulse_id, pump_id, start_at, duration_sec, group=None, on_done=None):
+        self.id = pulse_id
+        self.pump_id = pump_id
+        self.start_at = start_at
+        self.duration_sec = duration_sec
+        self.end_at = start_at + duration_sec
+        self.group = group
+        self.on_done = on_done
+        self.state = 'scheduled'        # scheduled → running → done | cancelled
+        self.switched_on_at = None
+        self.switched_off_at = None
+        self._finished = threading.Event()
+
+    @property
+    def delivered_fraction(self):
+        """Anteil der geplanten Laufzeit, den die Pumpe tatsächlich lief."""
+        if self.state == 'done':
+            return 1.0
+        if self.switched_on_at is None or self.duration_sec <= 0:
+            return 0.0
+        ran = (self.switched_off_at or self.switched_on_at) - self.switched_on_at
+        return min(1.0, ran / self.duration_sec)
+
+    def wait(self, timeout=None):
+        """Blockiert bis zum Ende; True, wenn der Impuls vollständig lief."""
+        self._finished.wait(timeout)
+        return self.state == 'done'
+
+
+class PulseEngine:
+    """Ein einziger Timer-Thread schaltet alle GPIO-Flanken aus einem Deadline-Heap.
+
+    switch(pump_id, on) wird im Timer-Thread aufgerufen. Impulse derselben Pumpe
+    werden hintereinander gelegt, nie überlappend. clock darf eine beschleunigte
+    Uhr sein (Simulator); ihr Attribut speed rechnet Wartezeiten in Echtzeit um.
+    """
+
+    def __init__(self, switch, clock=time.monotonic):
+        self._switch = switch
+        self._clock = clock
+        self._speed = getattr(clock, 'speed', 1.0)
+        self._cond = threading.Condition()
+        self._heap = []                 # (deadline, seq, edge, pulse)
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._pulses = {}               # pulse_id -> Pulse (geplant oder laufend)
+        self._busy_until = {}           # pump_id -> Ende des letzten geplanten Impulses
+        self._thread = None
+        self._stopped = False
+        self.max_lateness_sec = 0.0     # größte gemessene Verspätung einer Flanke
+
+    def schedule(self, pump_id, duration_sec, delay_sec=0.0, group=None, on_done=None):
+        """Impuls planen; startet frühestens nach delay_sec und erst, wenn die Pumpe frei ist."""
+        with self._cond:
+            now = self._clock()
+            start_at = max(now + delay_sec, self._busy_until.get(pump_id, now))
+            pulse = Pulse(next(self._ids), pump_id, start_at, duration_sec, group, on_done)
+            self._busy_until[pump_id] = pulse.end_at
+            self._pulses[pulse.id] = pulse
+            self._push(start_at, 'on', pulse)
+            self._push(pulse.end_at, 'off', pulse)
+            self._ensure_thread()
+            self._cond.notify()
+        return pulse
+
+    def cancel(self, pulse):
+        with self._cond:
+            self._cancel(pulse)
+            self._cond.notify()
+        self._notify_done(pulse)
+
+    def cancel_group(self, group):
+        """Alle Impulse einer Gruppe (z. B. eines Cocktails) abbrechen."""
+        with self._cond:
+            pulses = [p for p in self._pulses.values() if p.group == group]
+            for pulse in pulses:
+                self._cancel(pulse)
+            self._cond.notify()
+        for pulse in pulses:
+            self._notify_done(pulse)
+        return len(pulses)
+
+    def emergency_stop(self):
+        """Alles abbrechen und jede Pumpe sofort ausschalten."""
+        with self._cond:
+            pulses = list(self._pulses.values())
+            for pulse in pulses:
+                self._cancel(pulse)
+            self._cond.notify()
+        for pulse in pulses:
+            self._notify_done(pulse)
+        return len(pulses)
+
+    def shutdown(self):
+        self.emergency_stop()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    # -------------------------------------------------------------------------
+    # Intern
+    # -------------------------------------------------------------------------
+
+    def _push(self, deadline, edge, pulse):
+        heapq.heappush(self._heap, (deadline, next(self._seq), edge, pulse))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, daemon=True, name='pulse-engine')
+            self._thread.start()
+
+    def _cancel(self, pulse):
+        """Aufrufer hält self._cond. Die Heap-Einträge bleiben liegen und werden übersprungen."""
+        if pulse.state in ('done', 'cancelled'):
+            return
+        if pulse.state == 'running':
+            self._switch(pulse.pump_id, False)
+            pulse.switched_off_at = self._clock()
+        pulse.state = 'cancelled'
+        self._pulses.pop(pulse.id, None)
+        if self._busy_until.get(pulse.pump_id) == pulse.end_at:
+            self._busy_until.pop(pulse.pump_id)
+
+    def _notify_done(self, pulse):
+        pulse._finished.set()
+        if pulse.on_done:
+            pulse.on_done(pulse)
+
+    def _run(self):
+        while True:
+            finished = []
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = self._clock()
+                deadline = self._heap[0][0]
+                if deadline > now:
+                    self._cond.wait((deadline - now) / self._speed)
+                    continue
+                # alle fälligen Flanken in einem Durchgang schalten, Abschalten laufender
+                # Impulse zuerst: sonst laufen bei Verspätung kurz mehr Pumpen als geplant.
+                # Alles andere in Deadline-Reihenfolge – ein Impuls, dessen EIN und AUS
+                # beide fällig sind (Länge 0 oder verspätet), schaltet erst ein, dann aus.
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+                due.sort(key=lambda entry: not (entry[2] == 'off' and entry[3].state == 'running'))
+                for deadline, _, edge, pulse in due:
+                    if pulse.state == 'cancelled':
+                        continue
+                    self.max_lateness_sec = max(self.max_lateness_sec, now - deadline)
+                    if edge == 'on':
+                        pulse.state = 'running'
+                        pulse.switched_on_at = now
+                        self._switch(pulse.pump_id, True)
+                    else:
+                        self._switch(pulse.pump_id, False)
+                        pulse.switched_off_at = now
+                        pulse.state = 'done'
+                        self._pulses.pop(pulse.id, None)
+                        if self._busy_until.get(pulse.pump_id) == pulse.end_at:
+                            self._busy_until.pop(pulse.pump_id)
+                        finished.append(pulse)
+            for pulse in finished:
+                self._notify_done(pulse)
+
+
+class _ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _check_edges():
+    """Regressionsprüfung: Impulse der Länge 0 und verspätete Impulse enden ausgeschaltet."""
+    switches = []
+    clock = _ManualClock()
+    engine = PulseEngine(lambda pump_id, on: switches.append((pump_id, on)), clock=clock)
+    failures = []
+
+    zero = engine.schedule(3, 0.0)
+    if not zero.wait(1) or switches != [(3, True), (3, False)]:
+        failures.append(f'Impuls der Länge 0: {switches}, Zustand {zero.state}')
+
+    # Timer-Thread 50 ms aufhalten: EIN und AUS des 15-ms-Impulses werden im selben Durchgang fällig,
+    # zusammen mit dem AUS eines laufenden Impulses und dem direkt folgenden Impuls derselben Pumpe
+    switches.clear()
+    running = engine.schedule(1, 0.01)
+    while running.state != 'running':
+        time.sleep(0.001)
+    with engine._cond:
+        late = engine.schedule(4, 0.015)
+        follow = engine.schedule(4, 1.0)
+        clock.now += 0.05
+    if not late.wait(1) or not running.wait(1) or switches[-1] != (4, True) or follow.state != 'running':
+        failures.append(f'verspäteter Impuls: {switches}, Zustände {running.state}/{late.state}/{follow.state}')
+    if switches.index((1, False)) > switches.index((4, True)):
+        failures.append(f'AUS des laufenden Impulses nicht zuerst: {switches}')
+    engine.shutdown()
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Flanken-Reihenfolge in Ordnung")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    # python -m core.pulse_engine
+    import sys
+    sys.exit(_check_edges())
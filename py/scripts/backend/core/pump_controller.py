@@ -1,8 +1,94 @@
+import heapq
 import time
 import threading
+from collections import deque
+
+from core.calibration import PumpCalibration
+from core.pulse_engine import PulseEngine
+from utils.metrics import registry as metrics
+
+# Geteilte Pours lohnen sich erst, wenn sie den Cocktail spürbar schneller machen
+MIN_SPLIT_GAIN_SEC = 0.5
+_EPS = 1e-9
+
+
+def plan_pours(jobs, max_concurrent=None, split=False, slot_offsets=None):
+    """Pours auf höchstens max_concurrent gleichzeitig laufende Pumpen verteilen.
+
+    jobs: Liste von (key, duration_sec) oder (key, duration_sec, setup_sec); setup_sec
+    ist in duration_sec enthalten und fällt für jeden Teil eines geteilten Pours
+    erneut an (Ansaugen). slot_offsets: pro Slot die Zeit, ab der er
+    frei ist (belegt durch einen anderen Cocktail). Ohne Grenze laufen alle Pours
+    ab 0 parallel. Sonst LPT: längster Pour zuerst auf den frühesten freien Slot
+    (höchstens 4/3 des Optimums). Mit split zusätzlich McNaughtons Umlaufverfahren,
+    das lange Pours auf zwei Slots teilt und die Untergrenze
+    max(längster Pour, Summe / Slots) erreicht; genommen wird der kürzere Plan.
+
+    Rückgabe: (strategy, [(key, slot, start_sec, duration_sec), ...]).
+    """
+    if not jobs:
+        return 'parallel', []
+    jobs = [(job[0], job[1], job[2] if len(job) > 2 else 0.0) for job in jobs]
+    if not max_concurrent or max_concurrent >= len(jobs) and not any(slot_offsets or ()):
+        return 'parallel', [(key, slot, 0.0, duration) for slot, (key, duration, _) in enumerate(jobs)]
+
+    offsets = list(slot_offsets or [0.0] * max_concurrent)
+    strategy, segments = 'lpt', _plan_lpt(jobs, offsets)
+    if split:
+        wrapped = _plan_wrap_around(jobs, len(offsets), max(offsets))
+        if _makespan(wrapped) < _makespan(segments) - MIN_SPLIT_GAIN_SEC:
+            strategy, segments = 'wrap_around', wrapped
+    return strategy, segments
+
+
+def _plan_lpt(jobs, offsets):
+    slots = [(free_at, slot) for slot, free_at in enumerate(offsets)]
+    heapq.heapify(slots)
+    segments = []
+    for key, duration, _ in sorted(jobs, key=lambda job: -job[1]):
+        start, slot = heapq.heappop(slots)
+        segments.append((key, slot, start, duration))
+        heapq.heappush(slots, (start + duration, slot))
+    return segments
+
+
+def _plan_wrap_around(jobs, slot_count, base):
+    """McNaughton: Slots nacheinander bis zur Untergrenze füllen, Überhang in den nächsten Slot.
+
+    Der Rest eines geteilten Pours läuft im nächsten Slot ab base und braucht seine
+    Rüstzeit noch einmal. Weil die Untergrenze mindestens duration + setup ist, ist
+    er vorbei, bevor sein erster Teil beginnt – dieselbe Pumpe läuft also nie doppelt.
+    """
+    length = max(max(duration + setup for _, duration, setup in jobs),
+                 sum(duration for _, duration, _ in jobs) / slot_count)
+    end = base + length
+    segments = []
+    slot, t = 0, base
+    for key, duration, setup in jobs:
+        remaining, started = duration, False
+        while remaining > _EPS:
+            room = end - t
+            # Slot voll, oder der Platz reicht nur fürs Ansaugen: im nächsten Slot weiter
+            if slot < slot_count - 1 and (room <= _EPS or remaining > room and room <= setup + _EPS):
+                slot, t = slot + 1, base
+                if started:
+                    remaining += setup
+                continue
+            piece = remaining if slot == slot_count - 1 else min(remaining, room)
+            segments.append((key, slot, t, piece))
+            t += piece
+            remaining -= piece
+            started = True
+    return segments
+
+
+def _makespan(segments):
+    return max((start + duration for _, _, start, duration in segments), default=0.0)
+
 
 class PumpController:
-    def __init__(self):
+    def __init__(self, calibration=None, events=None, time_scale=1.0, max_concurrent_pumps=None,
+                 split_pours=False, gpio=None, clock=time.monotonic):
         # GPIO-Pins für eure 19 Pumpen (0-18)
         self.pump_pins = [
             4, 17, 18, 27, 22, 23, 24, 25,    # Pumpen 0-7
@@ -10,26 +96,63 @@ class PumpController:
             21, 7, 8                          # Pumpen 16-18 (Limette, Rohrzucker, Minze)
         ]
         
-        try:
-            import RPi.GPIO as GPIO
-            self.GPIO = GPIO
-            print("🔧 Hardware GPIO initialisiert")
-        except ImportError:
-            self.GPIO = self._create_dev_gpio()
-            print("🔧 Development-Modus (Mock GPIO)")
+        if gpio is not None:
+            self.GPIO = gpio            # z. B. SimulatedGPIO aus core/simulator.py
+        else:
+            try:
+                import RPi.GPIO as GPIO
+                self.GPIO = GPIO
+                print("🔧 Hardware GPIO initialisiert")
+            except ImportError:
+                self.GPIO = self._create_dev_gpio()
+                print("🔧 Development-Modus (Mock GPIO)")
             
         self.setup_gpio()
-        self.is_mixing = False
+        # Ein Timer-Thread für alle Flanken; Impulse derselben Pumpe überlappen nie
+        self._clock = clock
+        self.engine = PulseEngine(self._set_pump, clock=clock)
+        # Faktor auf die echten Pumpenzeiten (0 = ohne Wartezeit, z. B. für Benchmarks)
+        self.time_scale = time_scale
+        self._state_lock = threading.Lock()
+        self._active_mixes = 0
+        self._cancelled_groups = set()
+        self._pump_on_since = {}          # pump_id -> Einschaltzeitpunkt (für Laufzeit-Zähler)
+        self.calibration = calibration or PumpCalibration(len(self.pump_pins))
+        self._last_calibration_run = {}   # pump_id -> Laufzeit des letzten Kalibrierlaufs
+        self.events = events              # optionaler EventBus für Live-Status
+        # Leistungsgrenze des Netzteils: so viele Pumpen dürfen gleichzeitig laufen (None = alle)
+        self.max_concurrent_pumps = max_concurrent_pumps or None
+        self.split_pours = split_pours
+        self._slot_free_at = [0.0] * (self.max_concurrent_pumps or 0)   # monotone Zeit je Slot
+
+    @property
+    def is_mixing(self):
+        return self._active_mixes > 0
+
+    @property
+    def pump_count(self):
+        return len(self.pump_pins)
+
+    @property
+    def max_lateness_sec(self):
+        """Größte gemessene Verspätung einer GPIO-Flanke"""
+        return self.engine.max_lateness_sec
 
     def _create_dev_gpio(self):
         """GPIO-Mock für Entwicklung"""
         class DevGPIO:
             BCM, OUT, HIGH, LOW = 'BCM', 'OUT', 1, 0
+            def __init__(self):
+                # (time.monotonic(), pin, state) je Flanke – zum Prüfen der Timing-Genauigkeit
+                self.edges = deque(maxlen=10000)
             def setmode(self, mode): pass
             def setup(self, pin, mode): pass
             def output(self, pin, state):
+                self.edges.append((time.monotonic(), pin, state))
                 action = "EIN" if state == self.LOW else "AUS"
                 print(f"  GPIO {pin}: {action}")
+            def edges_for(self, pin):
+                return [(t, state) for t, p, state in self.edges if p == pin]
             def cleanup(self): pass
         return DevGPIO()
 
@@ -39,47 +162,190 @@ class PumpController:
             self.GPIO.setup(pin, self.GPIO.OUT)
             self.GPIO.output(pin, self.GPIO.HIGH)
 
-    def run_pump(self, pump_id, amount_ml):
-        """Einzelne Pumpe laufen lassen"""
-        if pump_id < 0 or pump_id >= len(self.pump_pins):
-            print(f"❌ Ungültige Pumpen-ID: {pump_id}")
-            return False
-            
-        pin = self.pump_pins[pump_id]
-        duration_sec = amount_ml * 0.5  # 2ml/s Kalibrierung
-        
-        print(f"🔄 Pumpe {pump_id} (GPIO {pin}): {amount_ml}ml für {duration_sec}s")
-        
-        self.GPIO.output(pin, self.GPIO.LOW)
-        time.sleep(duration_sec)
-        self.GPIO.output(pin, self.GPIO.HIGH)
-        
-        return True
+    def _publish(self, event_type, data):
+        if self.events is not None:
+            self.events.publish(event_type, data)
+
+    def _set_pump(self, pump_id, on):
+        """Relais schalten (aktiv LOW) und Zustandswechsel melden"""
+        self.GPIO.output(self.pump_pins[pump_id], self.GPIO.LOW if on else self.GPIO.HIGH)
+        if on:
+            self._pump_on_since.setdefault(pump_id, self._clock())
+        else:
+            since = self._pump_on_since.pop(pump_id, None)
+            if since is not None:
+                metrics.inc('cocktail_pump_runtime_seconds_total', self._clock() - since, pump=pump_id)
+        self._publish('pump', {'pump_id': pump_id, 'state': 'on' if on else 'off'})
 
-    def mix_cocktail(self, recipe, cocktail_name="Cocktail"):
-        """Kompletten Cocktail mixen"""
-        self.is_mixing = True
+    def _schedule(self, pump_id, duration_sec, delay_sec=0.0, **kwargs):
+        return self.engine.schedule(pump_id, duration_sec * self.time_scale,
+                                    delay_sec=delay_sec * self.time_scale, **kwargs)
+
+    def pump_duration(self, pump_id, amount_ml):
+        """Laufzeit in Sekunden für eine Menge laut Kalibrierungstabelle"""
+        return self.calibration.duration_for(pump_id, amount_ml)
+
+    def estimate_duration(self, recipe):
+        """Geschätzte Mixdauer laut Pour-Plan (ohne Wartezeit auf andere Cocktails)"""
+        return self.plan_mix(recipe)['total_sec']
+
+    def plan_mix(self, recipe, max_concurrent_pumps=None, split_pours=None, slot_offsets=None):
+        """Zeitplan der Pours eines Rezepts, ohne zu pumpen.
+
+        max_concurrent_pumps/split_pours überschreiben die Einstellung des Controllers
+        (zum Ausprobieren des Kompromisses aus Mixdauer und Stromaufnahme).
+        """
+        if max_concurrent_pumps is None:
+            max_concurrent_pumps = self.max_concurrent_pumps
+        if split_pours is None:
+            split_pours = self.split_pours
+
+        # Zeilen derselben Pumpe zusammenfassen: eine Pumpe = ein Job
+        pours = {}
+        for ingredient in recipe:
+            pour = pours.setdefault(ingredient['pump_id'], dict(ingredient, amount_ml=0))
+            pour['amount_ml'] += ingredient['amount_ml']
+        # Ansaugzeit als Rüstzeit: geteilte Pours saugen in jedem Teil neu an
+        priming = {pump_id: self.calibration.get(pump_id)['priming_sec'] for pump_id in pours}
+        jobs = [(pump_id, self.pump_duration(pump_id, pour['amount_ml']), priming[pump_id])
+                for pump_id, pour in pours.items()]
+        durations = {pump_id: duration for pump_id, duration, _ in jobs}
+
+        strategy, segments = plan_pours(jobs, max_concurrent_pumps, split_pours, slot_offsets)
+        steps = []
+        for pump_id, slot, start, duration in sorted(segments, key=lambda seg: (seg[2], seg[1])):
+            pour = pours[pump_id]
+            # nur die Förderzeit ohne Ansaugen wird auf die Teile verteilt
+            pumping = durations[pump_id] - priming[pump_id]
+            share = (duration - priming[pump_id]) / pumping if pumping > _EPS else 1.0
+            steps.append({
+                'pump_id': pump_id,
+                'ingredient_id': pour['ingredient_id'],
+                'ingredient_name': pour['ingredient_name'],
+                'amount_ml': round(pour['amount_ml'] * share, 2),
+                'slot': slot,
+                'start_sec': round(start, 3),
+                'duration_sec': round(duration, 3),
+            })
+
+        total = sum(durations.values())
+        longest = max(durations.values(), default=0.0)
+        return {
+            'strategy': strategy,
+            'max_concurrent_pumps': max_concurrent_pumps,
+            'split_pours': bool(split_pours),
+            'total_sec': round(_makespan(segments), 3),
+            'lower_bound_sec': round(max(longest, total / max_concurrent_pumps) if max_concurrent_pumps else longest, 3),
+            'sequential_sec': round(total, 3),
+            'steps': steps,
+        }
+
+    def _reserve_plan(self, recipe):
+        """Plan für einen echten Mix: Slots, die andere Cocktails noch belegen, abwarten."""
+        with self._state_lock:
+            now = self._clock()
+            offsets = None
+            if self.max_concurrent_pumps:
+                offsets = [max(0.0, free_at - now) / self.time_scale if self.time_scale else 0.0
+                           for free_at in self._slot_free_at]
+            plan = self.plan_mix(recipe, slot_offsets=offsets)
+            if self.max_concurrent_pumps:
+                for step in plan['steps']:
+                    end = now + (step['start_sec'] + step['duration_sec']) * self.time_scale
+                    self._slot_free_at[step['slot']] = max(self._slot_free_at[step['slot']], end)
+            return plan
+
+    def mix_cocktail(self, recipe, cocktail_name="Cocktail", group=None, report=None):
+        """Kompletten Cocktail mixen.
+
+        Alle Impulse werden auf einmal im Pulse-Engine geplant; group erlaubt
+        cancel_mix(group). report (dict) erhält die tatsächlich geförderten ml
+        pro ingredient_id. False, wenn der Cocktail abgebrochen wurde.
+        """
+        with self._state_lock:
+            self._active_mixes += 1
+        try:
+            return self._mix(recipe, cocktail_name, group, report)
+        finally:
+            with self._state_lock:
+                self._active_mixes -= 1
+                self._cancelled_groups.discard(group)
+                if not self._active_mixes:
+                    # Reservierungen abgebrochener Pours freigeben
+                    self._slot_free_at = [0.0] * len(self._slot_free_at)
+
+    def _mix(self, recipe, cocktail_name, group, report):
         print(f"🍸 Mixe Cocktail: {cocktail_name}")
+        plan = self._reserve_plan(recipe)
+        self._publish('mix', {'cocktail': cocktail_name, 'state': 'started',
+                              'duration_sec': plan['total_sec'], 'plan': plan})
+        progress = {'done': 0, 'total': len(plan['steps']), 'lock': threading.Lock()}
         
-        threads = []
-        for ingredient in recipe:
-            pump_id = ingredient['pump_id']
-            amount = ingredient['amount_ml']
-            ingredient_name = ingredient['ingredient_name']
-            
-            print(f"  → {ingredient_name}: {amount}ml")
-            t = threading.Thread(target=self.run_pump, args=(pump_id, amount))
-            threads.append(t)
-            t.start()
+        # Schritte nach Startzeit planen: der Pulse-Engine legt Impulse derselben Pumpe
+        # in Planungsreihenfolge hintereinander
+        pulses = []
+        for step in plan['steps']:
+            print(f"  → {step['ingredient_name']}: {step['amount_ml']}ml "
+                  f"(Slot {step['slot']}, ab {step['start_sec']}s für {step['duration_sec']}s)")
+            pulses.append((step, self._schedule(
+                step['pump_id'], step['duration_sec'], delay_sec=step['start_sec'], group=group,
+                on_done=lambda pulse, st=step: self._poured(pulse, st, cocktail_name, progress),
+            )))
         
-        for t in threads:
-            t.join()  # wait for every thread to finish
+        if group is not None and group in self._cancelled_groups:
+            self.engine.cancel_group(group)  # Abbruch kam, während noch geplant wurde
+        success = all([pulse.wait() for _, pulse in pulses])  # alle Impulse abwarten
+        poured = {}
+        for step, pulse in pulses:
+            poured_ml = step['amount_ml'] * pulse.delivered_fraction
+            metrics.inc('cocktail_pump_dispensed_ml_total', poured_ml, pump=step['pump_id'])
+            poured[step['ingredient_id']] = poured.get(step['ingredient_id'], 0) + poured_ml
+        if report is not None:
+            report.update(poured)
+        metrics.inc('cocktail_mixes_total', cocktail=cocktail_name, result='done' if success else 'cancelled')
 
-        print("✅ Cocktail fertig!")
-        return True
+        if success:
+            print("✅ Cocktail fertig!")
+        else:
+            print(f"🛑 Cocktail abgebrochen: {cocktail_name}")
+        self._publish('mix', {'cocktail': cocktail_name, 'state': 'finished' if success else 'cancelled'})
+        return success
+
+    def _poured(self, pulse, ingredient, cocktail_name, progress):
+        if pulse.state != 'done':
+            return
+        with progress['lock']:
+            progress['done'] += 1
+            done = progress['done']
+        self._publish('mix_progress', {
+            'cocktail': cocktail_name,
+            'ingredient_id': ingredient['ingredient_id'],
+            'ingredient_name': ingredient['ingredient_name'],
+            'done': done,
+            'total': progress['total'],
+        })
+
+    def cancel_mix(self, group):
+        """Laufenden Cocktail abbrechen (alle Impulse der Gruppe)"""
+        with self._state_lock:
+            self._cancelled_groups.add(group)
+        cancelled = self.engine.cancel_group(group)
+        if cancelled:
+            print(f"🛑 {cancelled} Impuls(e) abgebrochen")
+        return cancelled > 0
+
+    def emergency_stop(self):
+        """Not-Aus: alle geplanten und laufenden Impulse abbrechen, alle Pumpen aus"""
+        cancelled = self.engine.emergency_stop()
+        with self._state_lock:
+            self._slot_free_at = [0.0] * len(self._slot_free_at)
+        for pump_id in range(len(self.pump_pins)):
+            self._set_pump(pump_id, False)
+        print(f"🛑 Not-Aus: {cancelled} Impuls(e) abgebrochen")
+        return cancelled
 
     def test_pump(self, pump_id, duration_sec=2):
-        """Einzelne Pumpe testen"""
+        """Einzelne Pumpe testen (kehrt sofort zurück, das Abschalten übernimmt der Pulse-Engine)"""
         if pump_id < 0 or pump_id >= len(self.pump_pins):
             print(f"❌ Ungültige Pumpen-ID: {pump_id}")
             return False
@@ -87,11 +353,40 @@ class PumpController:
         pin = self.pump_pins[pump_id]
         print(f"🔧 Test Pumpe {pump_id} (GPIO {pin}) für {duration_sec}s")
         
-        self.GPIO.output(pin, self.GPIO.LOW)
-        time.sleep(duration_sec)
-        self.GPIO.output(pin, self.GPIO.HIGH)
+        self._schedule(pump_id, duration_sec)
         return True
     
+    def run_calibration(self, pump_id, duration_sec=10):
+        """Kalibrierlauf: Pumpe eine feste Zeit laufen lassen, danach Menge auslitern"""
+        if not self.test_pump(pump_id, duration_sec):
+            return False
+        self._last_calibration_run[pump_id] = duration_sec
+        return True
+
+    def get_calibration(self, pump_id=None):
+        """Kalibrierungstabelle (alle Pumpen) oder Eintrag einer Pumpe"""
+        if pump_id is None:
+            return self.calibration.to_list()
+        return self.calibration.get(pump_id)
+
+    def update_calibration(self, pump_id, viscosity_factor=None, priming_sec=None):
+        return self.calibration.update(pump_id, viscosity_factor=viscosity_factor, priming_sec=priming_sec)
+
+    def store_calibration(self, pump_id, measured_ml, duration_sec=None):
+        """Gemessene Menge eines Kalibrierlaufs übernehmen und Durchfluss speichern"""
+        if pump_id < 0 or pump_id >= len(self.pump_pins):
+            print(f"❌ Ungültige Pumpen-ID: {pump_id}")
+            return None
+        if duration_sec is None:
+            duration_sec = self._last_calibration_run.get(pump_id)
+        if duration_sec is None:
+            print(f"❌ Kein Kalibrierlauf für Pumpe {pump_id}")
+            return None
+
+        entry = self.calibration.record_measurement(pump_id, duration_sec, measured_ml)
+        print(f"📏 Pumpe {pump_id}: {entry['flow_ml_per_sec']:.2f}ml/s kalibriert")
+        return entry
+
     def start_pump(self, pump_id):
         """Pumpe manuell einschalten (ohne Timeout)"""
         if pump_id < 0 or pump_id >= len(self.pump_pins):
@@ -100,7 +395,7 @@ class PumpController:
 
         pin = self.pump_pins[pump_id]
         print(f"▶️ Start Pumpe {pump_id} (GPIO {pin})")
-        self.GPIO.output(pin, self.GPIO.LOW)
+        self._set_pump(pump_id, True)
         return True
 
     def stop_pump(self, pump_id):
@@ -111,9 +406,10 @@ class PumpController:
 
         pin = self.pump_pins[pump_id]
         print(f"⏹️ Stop Pumpe {pump_id} (GPIO {pin})")
-        self.GPIO.output(pin, self.GPIO.HIGH)
+        self._set_pump(pump_id, False)
         return True
 
     def cleanup(self):
+        self.engine.shutdown()
         self.GPIO.cleanup()
         print("🧹 GPIO cleanup abgeschlossen")
@@ -0,0 +1,315 @@
+"""Hardware-in-the-loop-Simulator: PumpController und OrderQueue gegen virtuelle Zeit.
+
+Eine beschleunigte Uhr (VirtualClock) ersetzt time.monotonic/time.time im
+Pulse-Engine und in der Warteschlange, SimulatedGPIO ersetzt die Relais und
+modelliert Flaschenvorrat und Durchfluss. Damit lässt sich ein ganzer Abend
+aus Bestellungen in Sekunden nachspielen:
+
+    python -m core.simulator --orders 30 --rate 40 --speed 200
+    python -m core.simulator --from-log --hours 6     # echte Bestellungen aus dem Bestell-Log
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from core.calibration import PumpCalibration
+from core.order_queue import OrderQueue
+from core.pump_controller import PumpController
+
+DEFAULT_BOTTLE_ML = 2000
+
+
+class VirtualClock:
+    """Monotone Uhr, die speed-mal schneller läuft als die echte (Start bei 0)."""
+
+    def __init__(self, speed=100.0, epoch=None):
+        self.speed = speed
+        self.epoch = time.time() if epoch is None else epoch   # Wanduhr-Zeit bei virtuell 0
+        self._real_start = time.monotonic()
+
+    def __call__(self):
+        return (time.monotonic() - self._real_start) * self.speed
+
+    def wall(self):
+        """Virtuelle Wanduhr (Ersatz für time.time)."""
+        return self.epoch + self()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def sleep_until(self, t):
+        self.sleep(t - self())
+
+
+class SimulatedGPIO:
+    """GPIO-Ersatz: zeichnet pro Pumpe eine Zeitleiste auf und zapft simulierte Flaschen an.
+
+    Pumpen-IDs ergeben sich aus der Reihenfolge von setup() (wie in
+    PumpController.setup_gpio). Aus der Einschaltdauer wird über die Kalibrierung
+    die geförderte Menge berechnet; ist die Flasche leer, läuft die Pumpe trocken
+    (dry_ml zählt die Fehlmenge).
+    """
+
+    BCM, OUT, HIGH, LOW = 'BCM', 'OUT', 1, 0
+
+    def __init__(self, clock, calibration, bottles=None, default_bottle_ml=DEFAULT_BOTTLE_ML):
+        self.clock = clock
+        self.calibration = calibration
+        self._initial = bottles or {}
+        self._default_bottle_ml = default_bottle_ml
+        self._lock = threading.Lock()
+        self._pump_of_pin = {}
+        self._on_since = {}         # pin -> virtuelle Einschaltzeit
+        self.timelines = {}         # pump_id -> [(an, aus, ml)]
+        self.bottles = {}
+        self.dispensed_ml = {}
+        self.dry_ml = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, mode):
+        pump_id = len(self._pump_of_pin)
+        self._pump_of_pin[pin] = pump_id
+        self.timelines[pump_id] = []
+        self.bottles[pump_id] = float(self._initial.get(pump_id, self._default_bottle_ml))
+        self.dispensed_ml[pump_id] = 0.0
+        self.dry_ml[pump_id] = 0.0
+
+    def cleanup(self):
+        pass
+
+    def output(self, pin, state):
+        now = self.clock()
+        with self._lock:
+            if state == self.LOW:                            # Relais aktiv LOW: Pumpe an
+                self._on_since.setdefault(pin, now)
+                return
+            since = self._on_since.pop(pin, None)
+            if since is None:
+                return
+            pump_id = self._pump_of_pin[pin]
+            wanted = self._flow_ml(pump_id, now - since)
+            poured = min(wanted, self.bottles[pump_id])
+            self.bottles[pump_id] -= poured
+            self.dispensed_ml[pump_id] += poured
+            self.dry_ml[pump_id] += wanted - poured
+            self.timelines[pump_id].append((since, now, poured))
+
+    def _flow_ml(self, pump_id, seconds):
+        # Umkehrung von PumpCalibration.duration_for
+        entry = self.calibration.get(pump_id)
+        flowing = max(0.0, seconds - entry['priming_sec'])
+        return flowing * entry['flow_ml_per_sec'] / entry['viscosity_factor']
+
+    def peak_concurrency(self):
+        """Höchste Zahl gleichzeitig laufender Pumpen (für die Leistungsgrenze)."""
+        edges = sorted((t, delta) for timeline in self.timelines.values()
+                       for start, end, _ in timeline for t, delta in ((start, 1), (end, -1)))
+        running = peak = 0
+        for _, delta in edges:
+            running += delta
+            peak = max(peak, running)
+        return peak
+
+
+class Simulator:
+    """PumpController + OrderQueue auf SimulatedGPIO und VirtualClock."""
+
+    def __init__(self, speed=200.0, bottles=None, calibration=None, max_workers=2, max_pending=20,
+                 max_concurrent_pumps=None, split_pours=False):
+        self.clock = VirtualClock(speed)
+        self.calibration = calibration or PumpCalibration(19)
+        self.gpio = SimulatedGPIO(self.clock, self.calibration, bottles)
+        self.pump_controller = PumpController(
+            calibration=self.calibration, gpio=self.gpio, clock=self.clock,
+            max_concurrent_pumps=max_concurrent_pumps, split_pours=split_pours,
+        )
+        self.order_queue = OrderQueue(self.pump_controller, max_workers=max_workers,
+                                      max_pending=max_pending, history_size=100000,
+                                      clock=self.clock.wall)
+
+    def replay(self, stream):
+        """stream: [(Sekunden ab Start, cocktail)]. Bestellt zur virtuellen Zeit und wartet bis alles fertig ist."""
+        submitted, rejected = [], 0
+        max_depth = 0
+        for offset, cocktail in sorted(stream, key=lambda item: item[0]):
+            self.clock.sleep_until(offset)
+            order = self.order_queue.submit(cocktail)
+            if order is None:
+                rejected += 1
+                continue
+            submitted.append(order.id)
+            max_depth = max(max_depth, self.order_queue.depth)
+
+        while True:
+            status = self.order_queue.get_status()
+            if not status['running'] and not status['depth']:
+                break
+            self.clock.sleep(1.0)
+        return self._report(submitted, rejected, max_depth)
+
+    def _report(self, order_ids, rejected, max_depth):
+        orders = [self.order_queue.get_order(order_id) for order_id in order_ids]
+        done = [o for o in orders if o['status'] == 'done']
+        waits = sorted(o['started_at'] - o['created_at'] for o in done)
+        mixes = sorted(o['finished_at'] - o['started_at'] for o in done)
+        epoch = self.clock.epoch
+        span = max((o['finished_at'] for o in done), default=epoch) - epoch
+        return {
+            'orders': len(order_ids) + rejected,
+            'completed': len(done),
+            'failed': len(orders) - len(done),
+            'rejected_queue_full': rejected,
+            'virtual_duration_sec': round(span, 1),
+            'throughput_per_hour': round(len(done) / span * 3600, 1) if span else 0.0,
+            'wait_sec': _percentiles(waits),
+            'mix_sec': _percentiles(mixes),
+            'max_queue_depth': max_depth,
+            'peak_concurrent_pumps': self.gpio.peak_concurrency(),
+            'max_edge_lateness_sec': round(self.pump_controller.max_lateness_sec, 3),
+            'pumps': {
+                pump_id: {
+                    'runtime_sec': round(sum(end - start for start, end, _ in timeline), 1),
+                    'dispensed_ml': round(self.gpio.dispensed_ml[pump_id], 1),
+                    'bottle_left_ml': round(self.gpio.bottles[pump_id], 1),
+                    'dry_ml': round(self.gpio.dry_ml[pump_id], 1),
+                }
+                for pump_id, timeline in self.gpio.timelines.items() if timeline
+            },
+        }
+
+    def shutdown(self):
+        self.pump_controller.cleanup()
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50': round(pick(0.5), 1), 'p95': round(pick(0.95), 1), 'max': round(values[-1], 1)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bestellströme
+# ─────────────────────────────────────────────────────────────────────────────
+
+def generate_order_stream(cocktails, count, rate_per_hour, seed=1):
+    """Poisson-Ankünfte mit rate_per_hour, Drinks gleichverteilt aus cocktails."""
+    rng = random.Random(seed)
+    t, stream = 0.0, []
+    for _ in range(count):
+        t += rng.expovariate(rate_per_hour / 3600)
+        stream.append((t, rng.choice(cocktails)))
+    return stream
+
+
+def order_stream_from_log(db, hours):
+    """Bestellungen der letzten hours Stunden aus dem Bestell-Log, relativ zur ersten."""
+    rows = db.get_order_history(time.time() - hours * 3600)
+    stream = []
+    for drink_id, ordered_at in rows:
+        cocktail = db.get_cocktail(drink_id)
+        if cocktail is not None:
+            stream.append((ordered_at - rows[0][1], cocktail))
+    return stream
+
+
+def snapshot_database(path):
+    """Kopie der Datenbank in einer temporären Datei; das Original wird nur lesend geöffnet.
+
+    CocktailDatabase schaltet auf WAL um und check_schema() migriert – beides soll
+    die echte mixes.db nicht treffen.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Datenbank {path} nicht gefunden!")
+    fd, copy = tempfile.mkstemp(prefix='cocktail-sim-', suffix='.db')
+    os.close(fd)
+    source = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return copy
+
+
+def main():
+    from database.cocktail_db import CocktailDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='database/mixes.db', help='Rezepte und Bestell-Log (gelesen wird eine Kopie)')
+    parser.add_argument('--speed', type=float, default=200.0, help='Faktor der virtuellen Uhr')
+    parser.add_argument('--orders', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=40.0, help='Bestellungen pro Stunde')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--from-log', action='store_true', help='Bestell-Log statt zufälliger Bestellungen')
+    parser.add_argument('--hours', type=float, default=6.0, help='Zeitraum für --from-log')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-pumps', type=int, default=0, help='Leistungsgrenze (0 = keine)')
+    parser.add_argument('--split-pours', action='store_true')
+    parser.add_argument('--bottle-ml', type=float, default=DEFAULT_BOTTLE_ML)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    copy = snapshot_database(args.db)
+    db = CocktailDatabase(copy)
+    try:
+        if args.from_log:
+            db.check_schema()
+            stream = order_stream_from_log(db, args.hours)
+        else:
+            stream = generate_order_stream(db.get_available_cocktails(), args.orders, args.rate, args.seed)
+    finally:
+        db.close()
+        for path in (copy, copy + '-wal', copy + '-shm'):
+            if os.path.exists(path):
+                os.unlink(path)
+    if not stream:
+        print('Keine Bestellungen zum Abspielen', file=sys.stderr)
+        return 1
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with output:
+        simulator = Simulator(speed=args.speed, bottles={p: args.bottle_ml for p in range(19)},
+                              max_workers=args.workers, max_concurrent_pumps=args.max_pumps or None,
+                              split_pours=args.split_pours)
+        try:
+            report = simulator.replay(stream)
+        finally:
+            simulator.shutdown()
+    report['real_duration_sec'] = round(time.perf_counter() - started, 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"Bestellungen: {report['orders']}  fertig: {report['completed']}  "
+          f"fehlgeschlagen: {report['failed']}  abgelehnt: {report['rejected_queue_full']}")
+    print(f"Virtuelle Dauer: {report['virtual_duration_sec']}s  (echt {report['real_duration_sec']}s)  "
+          f"Durchsatz: {report['throughput_per_hour']}/h")
+    print(f"Wartezeit  p50/p95/max: {report['wait_sec']['p50']}/{report['wait_sec']['p95']}/{report['wait_sec']['max']}s")
+    print(f"Mixdauer   p50/p95/max: {report['mix_sec']['p50']}/{report['mix_sec']['p95']}/{report['mix_sec']['max']}s")
+    print(f"Max. Warteschlange: {report['max_queue_depth']}  max. gleichzeitige Pumpen: "
+          f"{report['peak_concurrent_pumps']}  max. Flanken-Verspätung: {report['max_edge_lateness_sec']}s")
+    for pump_id, pump in sorted(report['pumps'].items()):
+        dry = f"  TROCKEN {pump['dry_ml']}ml" if pump['dry_ml'] else ''
+        print(f"  Pumpe {pump_id:2d}: {pump['runtime_sec']:7.1f}s  {pump['dispensed_ml']:7.1f}ml  "
+              f"Rest {pump['bottle_left_ml']:7.1f}ml{dry}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,45 +1,385 @@
-import sqlite3
 import os
+import threading
+import time
+
+from database import migrations, order_log
+from database.connection import ConnectionManager
+from utils.metrics import registry as metrics
+
+DB_TIMER = 'cocktail_db_call_duration_seconds'
+
+# Rezept-Graph für den Menü-Cache; ORDER BY über r.ingredientID, damit der
+# Covering-Index (drinkID, ingredientID, level) die Sortierung mitliefert
+MENU_QUERY = '''
+    SELECT d.ID, d.Getränk, d.Alkohol, d.Beschreibung,
+           i.ingredientID, i.ingredient, i.isLiquid,
+           r.level AS amount_ml,
+           i.currentLevel
+    FROM drinks d
+    JOIN recipies r ON r.drinkID = d.ID
+    JOIN ingredients i ON i.ingredientID = r.ingredientID
+    ORDER BY d.ID, r.ingredientID
+'''
+
+# Tabellen und Spalten, ohne die Menü und Bestellungen nicht funktionieren
+REQUIRED_COLUMNS = {
+    'drinks': {'ID', 'Getränk', 'Alkohol', 'Beschreibung'},
+    'recipies': {'drinkID', 'ingredientID', 'level'},
+    'ingredients': {'ingredientID', 'ingredient', 'isLiquid', 'currentLevel', 'maxLevel'},
+}
+
+
+class MenuCache:
+    """Hält den gruppierten Rezept-Graphen im Speicher und liefert vorberechnete Menü-Ansichten.
+
+    Ein invertierter Index (Zutat → Drinks mit benötigter Menge) sorgt dafür, dass
+    eine Füllstandsänderung nur die Drinks neu bewertet, die diese Zutat verwenden.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._drinks = None        # drink_id -> Drink-Dict (ohne interne Keys)
+        self._requirements = {}    # drink_id -> [(ingredient_id, amount_ml)] flüssige Zutaten
+        self._users = {}           # ingredient_id -> [(drink_id, amount_ml)] (invertierter Index)
+        self._shortfalls = {}      # drink_id -> {ingredient_id, ...} mit zu wenig Vorrat
+        self._levels = {}          # ingredient_id -> currentLevel
+        self._views = None
+        self.hits = 0
+        self.misses = 0
+        self.level_updates = 0
+        self.reevaluated_drinks = 0
+
+    @property
+    def is_loaded(self):
+        return self._drinks is not None
+
+    def get_views(self, loader):
+        """Liefert die Ansichten; lädt den Graphen über loader() nur beim ersten Zugriff."""
+        with self._lock:
+            self._ensure_loaded(loader)
+            if self._views is None:
+                self._views = self._build_views()
+            return self._views
+
+    def update_levels(self, levels):
+        """Write-Through: neue Füllstände übernehmen und nur betroffene Drinks neu bewerten."""
+        with self._lock:
+            if self._drinks is None:
+                return
+            self.level_updates += 1
+            flipped = False
+            for ing_id, level in levels.items():
+                self._levels[ing_id] = level
+                for drink_id, amount in self._users.get(ing_id, ()):
+                    self.reevaluated_drinks += 1
+                    short = self._shortfalls[drink_id]
+                    was_makeable = not short
+                    if level < amount:
+                        short.add(ing_id)
+                    else:
+                        short.discard(ing_id)
+                    flipped |= was_makeable != (not short)
+            if flipped:
+                self._views = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._drinks is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'level_updates': self.level_updates,
+                'reevaluated_drinks': self.reevaluated_drinks,
+            }
+
+    # -------------------------------------------------------------------------
+    # Abfragen über den Index
+    # -------------------------------------------------------------------------
+
+    def servings_left(self, drink_id, loader):
+        """Wie oft kann dieser Drink noch gemixt werden, und welche Zutat geht zuerst aus?"""
+        with self._lock:
+            self._ensure_loaded(loader)
+            if drink_id not in self._drinks:
+                return None
+            servings, limiting = None, None
+            for ing_id, amount in self._requirements[drink_id]:
+                if amount <= 0:
+                    continue
+                n = int(self._levels.get(ing_id, 0) // amount)
+                if servings is None or n < servings:
+                    servings, limiting = n, ing_id
+            return {
+                'drink_id': drink_id,
+                'servings': servings,
+                'limiting_ingredient_id': limiting,
+                'missing_ingredient_ids': sorted(self._shortfalls[drink_id]),
+            }
+
+    def ingredient_usage(self, ingredient_id, loader):
+        """Drinks, die eine Zutat verwenden, mit Portionen allein aus deren Vorrat."""
+        with self._lock:
+            self._ensure_loaded(loader)
+            level = self._levels.get(ingredient_id)
+            users = self._users.get(ingredient_id, [])
+            return {
+                'ingredient_id': ingredient_id,
+                'current_level': level,
+                'drinks': [
+                    {
+                        'drink_id': drink_id,
+                        'name': self._drinks[drink_id]['name'],
+                        'amount_ml': amount,
+                        'servings': int((level or 0) // amount) if amount > 0 else None,
+                        'makeable': not self._shortfalls[drink_id],
+                    }
+                    for drink_id, amount in sorted(users, key=lambda u: -u[1])
+                ],
+            }
+
+    def bottlenecks(self, loader, limit=None):
+        """Zutaten, die zuerst ausgehen: sortiert nach Portionen des durstigsten Drinks."""
+        with self._lock:
+            self._ensure_loaded(loader)
+            rows = []
+            for ing_id, users in self._users.items():
+                drink_id, amount = max(users, key=lambda u: u[1])
+                if amount <= 0:
+                    continue
+                level = self._levels.get(ing_id, 0)
+                rows.append({
+                    'ingredient_id': ing_id,
+                    'current_level': level,
+                    'max_amount_ml': amount,
+                    'servings_left': int(level // amount),
+                    'used_by_drinks': len(users),
+                })
+            rows.sort(key=lambda r: (r['servings_left'], -r['used_by_drinks']))
+            return rows[:limit] if limit else rows
+
+    def drink(self, drink_id, loader):
+        """Drink unabhängig von der Verfügbarkeit (z. B. für kleinere Portionen)."""
+        with self._lock:
+            self._ensure_loaded(loader)
+            return self._drinks.get(drink_id)
+
+    def stock_check(self, recipe, loader):
+        """Wie oft reicht der Vorrat für diese Rezeptzeilen, und was fehlt für eine Portion?"""
+        amounts = {}
+        for ing in recipe:
+            amounts[ing['ingredient_id']] = amounts.get(ing['ingredient_id'], 0) + ing['amount_ml']
+        with self._lock:
+            self._ensure_loaded(loader)
+            servings = None
+            missing = {}
+            for ing_id, amount in amounts.items():
+                if amount <= 0:
+                    continue
+                level = self._levels.get(ing_id, 0)
+                n = int(level // amount)
+                servings = n if servings is None else min(servings, n)
+                if level < amount:
+                    missing[ing_id] = amount - level
+            return {'servings': servings, 'missing_ml': missing}
+
+    def drink_requirements(self, loader):
+        """[(drink_id, name, [(ingredient_id, amount_ml), ...])] aller Drinks mit flüssigen Zutaten."""
+        with self._lock:
+            self._ensure_loaded(loader)
+            return [(drink_id, self._drinks[drink_id]['name'], list(reqs))
+                    for drink_id, reqs in self._requirements.items() if reqs]
+
+    # -------------------------------------------------------------------------
+    # Intern (Aufrufer hält self._lock)
+    # -------------------------------------------------------------------------
+
+    def _ensure_loaded(self, loader):
+        if self._drinks is not None:
+            self.hits += 1
+            return
+        self.misses += 1
+        drinks, requirements, levels = loader()
+        users = {}
+        shortfalls = {}
+        for drink_id, reqs in requirements.items():
+            shortfalls[drink_id] = {ing_id for ing_id, amount in reqs if levels.get(ing_id, 0) < amount}
+            for ing_id, amount in reqs:
+                users.setdefault(ing_id, []).append((drink_id, amount))
+        self._drinks = drinks
+        self._requirements = requirements
+        self._levels = levels
+        self._users = users
+        self._shortfalls = shortfalls
+        self._views = None
+
+    def _build_views(self):
+        available = [drink for drink_id, drink in self._drinks.items() if not self._shortfalls[drink_id]]
+        return {
+            'all': available,
+            'alcoholic': [d for d in available if d['alkoholisch']],
+            'non_alcoholic': [d for d in available if not d['alkoholisch']],
+            'by_id': {d['id']: d for d in available},
+        }
+
 
 class CocktailDatabase:
-    def __init__(self, db_path='database/mixes.db'):
+    def __init__(self, db_path='database/mixes.db', events=None, sync_interval=0.5):
         self.db_path = db_path
+        self.events = events    # optionaler EventBus für Füllstandsänderungen
         self._check_database_exists()
+        self._pool = ConnectionManager(db_path)
+        self._menu = MenuCache()
+        # Inventar-Version: steigt bei jedem Schreibzugriff (Basis für ETags/Antwort-Caches)
+        self._version_lock = threading.Lock()
+        self._version = 1
+        self._version_time = time.time()
+        # Abgleich mit Schreibzugriffen anderer Prozesse (z. B. Hardware-Prozess, andere Worker)
+        self.sync_interval = sync_interval
+        self._sync_lock = threading.Lock()
+        self._sync_local = threading.local()
+        self._last_sync = 0.0
+        self._snapshot = None   # ingredient_id -> (currentLevel, maxLevel)
+        self._level_listeners = []
 
     def _check_database_exists(self):
         if not os.path.exists(self.db_path):
             raise FileNotFoundError(f"Datenbank {self.db_path} nicht gefunden!")
 
+    def check_schema(self):
+        """Ausstehende Migrationen anwenden und Pflichtspalten prüfen (einmal beim Start)."""
+        conn = self._get_conn()
+        migrations.migrate(conn)
+        with conn:
+            problems = []
+            for table, columns in REQUIRED_COLUMNS.items():
+                existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+                if not existing:
+                    problems.append(f'Tabelle {table} fehlt')
+                elif columns - existing:
+                    problems.append(f"{table}: Spalten {', '.join(sorted(columns - existing))} fehlen")
+            if problems:
+                raise RuntimeError(f"Datenbank {self.db_path} unvollständig: {'; '.join(problems)}")
+
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        """Gepoolte Verbindung des aktuellen Threads (`with` committet, schließt aber nicht)."""
+        return self._pool.get()
+
+    def close(self):
+        self._pool.close_all()
+
+    def set_statement_hook(self, callback):
+        """callback(sql) für jede SQL-Anweisung (Benchmarks, Query-Zählung); None schaltet ab."""
+        self._pool.set_trace_callback(callback)
 
     # -------------------------------------------------------------------------
     # Cocktails
     # -------------------------------------------------------------------------
 
+    @metrics.timed(DB_TIMER)
     def get_available_cocktails(self, alkoholisch=None):
-        """Verfügbare Cocktails via JOIN über drinks → recipies → ingredients."""
+        """Verfügbare Cocktails aus dem Menü-Cache (Rückgabe nicht verändern)."""
+        views = self._menu_views()
+        if alkoholisch is None:
+            return list(views['all'])
+        return list(views['alcoholic'] if alkoholisch else views['non_alcoholic'])
+
+    @metrics.timed(DB_TIMER)
+    def get_cocktail_by_id(self, cocktail_id):
+        return self._menu_views()['by_id'].get(cocktail_id)
+
+    def get_cocktail(self, cocktail_id):
+        """Cocktail auch dann, wenn er in Normalgröße gerade nicht verfügbar ist."""
+        self.sync_external_writes()
+        return self._menu.drink(cocktail_id, self._load_menu)
+
+    def check_stock(self, recipe):
+        """{'servings': Portionen aus dem Vorrat, 'missing_ml': {ingredient_id: fehlende ml}}"""
+        self.sync_external_writes()
+        return self._menu.stock_check(recipe, self._load_menu)
+
+    def get_alcoholic_cocktails(self):
+        return self.get_available_cocktails(alkoholisch=1)
+
+    def get_non_alcoholic_cocktails(self):
+        return self.get_available_cocktails(alkoholisch=0)
+
+    def _menu_views(self):
+        self.sync_external_writes()
+        return self._menu.get_views(self._load_menu)
+
+    def get_cache_stats(self):
+        return self._menu.stats()
+
+    def get_servings_left(self, cocktail_id):
+        """Restportionen eines Cocktails und die Zutat, die zuerst ausgeht (None, wenn unbekannt)."""
+        return self._menu.servings_left(cocktail_id, self._load_menu)
+
+    def get_ingredient_usage(self, ingredient_id):
+        return self._menu.ingredient_usage(ingredient_id, self._load_menu)
+
+    def get_bottlenecks(self, limit=None):
+        return self._menu.bottlenecks(self._load_menu, limit)
+
+    def get_drink_requirements(self):
+        return self._menu.drink_requirements(self._load_menu)
+
+    def add_level_listener(self, callback):
+        """callback({ingredient_id: level}) nach jeder Füllstandsänderung, auch aus anderen Prozessen."""
+        self._level_listeners.append(callback)
+
+    def get_inventory_version(self):
+        """(Version, Zeitpunkt der letzten Änderung) – monoton steigend pro Prozess."""
+        self.sync_external_writes()
+        with self._version_lock:
+            return self._version, self._version_time
+
+    def sync_external_writes(self, force=False):
+        """Füllstände übernehmen, die andere Prozesse geschrieben haben.
+
+        PRAGMA data_version ändert sich nur, wenn eine andere Verbindung committet hat;
+        dann wird die kleine ingredients-Tabelle mit dem letzten Stand verglichen.
+        Geprüft wird höchstens alle sync_interval Sekunden.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return False
+        self._last_sync = now
+
+        conn = self._get_conn()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if not force and getattr(self._sync_local, 'data_version', None) == data_version:
+            return False
+        self._sync_local.data_version = data_version
+
+        rows = conn.execute('SELECT ingredientID, currentLevel, maxLevel FROM ingredients').fetchall()
+        with self._sync_lock:
+            previous = self._snapshot
+            self._snapshot = {row[0]: (row[1], row[2]) for row in rows}
+        if previous is None:
+            self._menu.update_levels({ing_id: level for ing_id, (level, _) in self._snapshot.items()})
+            return False
+
+        changed = {ing_id: values for ing_id, values in self._snapshot.items() if previous.get(ing_id) != values}
+        if not changed:
+            return False
+        self._levels_changed({ing_id: level for ing_id, (level, _) in changed.items()}, remember=False)
+        return True
+
+    def _bump_version(self):
+        with self._version_lock:
+            self._version += 1
+            self._version_time = time.time()
+
+    @metrics.timed(DB_TIMER)
+    def _load_menu(self):
+        """Rezept-Graph via JOIN über drinks → recipies → ingredients laden."""
         with self._get_conn() as conn:
-            params = []
-            query = '''
-                SELECT d.ID, d.Getränk, d.Alkohol, d.Beschreibung,
-                       i.ingredientID, i.ingredient, i.isLiquid,
-                       r.level AS amount_ml,
-                       i.currentLevel
-                FROM drinks d
-                JOIN recipies r ON r.drinkID = d.ID
-                JOIN ingredients i ON i.ingredientID = r.ingredientID
-            '''
-            if alkoholisch is not None:
-                query += ' WHERE d.Alkohol = ?'
-                params.append(alkoholisch)
-            query += ' ORDER BY d.ID, i.ingredientID'
-
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
+            rows = conn.execute(MENU_QUERY).fetchall()
 
         # Group rows by drink
         drinks_map = {}
+        requirements = {}
+        levels = {}
         for row in rows:
             drink_id, name, alkohol_flag, description, \
                 ing_id, ing_name, is_liquid, amount_ml, current_level = row
@@ -55,17 +395,14 @@ class CocktailDatabase:
                     'liquid_recipe': [],
                     'manual_ingredients': [],
                     'requires_manual_steps': False,
-                    # internal tracking only
-                    '_makeable': True,
                 }
+                requirements[drink_id] = []
 
             drink = drinks_map[drink_id]
+            levels[ing_id] = current_level
 
             if is_liquid:
-                # Check availability
-                if current_level < amount_ml:
-                    drink['_makeable'] = False
-
+                requirements[drink_id].append((ing_id, amount_ml))
                 drink['liquid_recipe'].append({
                     'pump_id': ing_id - 1,   # pump_id starts at 0
                     'ingredient_id': ing_id,
@@ -83,28 +420,13 @@ class CocktailDatabase:
                 })
                 drink['requires_manual_steps'] = True
 
-        # Filter out drinks that can't be made and clean internal keys
-        available = []
-        for drink in drinks_map.values():
-            if drink.pop('_makeable'):
-                available.append(drink)
-
-        return available
-
-    def get_cocktail_by_id(self, cocktail_id):
-        cocktails = self.get_available_cocktails()
-        return next((c for c in cocktails if c['id'] == cocktail_id), None)
-
-    def get_alcoholic_cocktails(self):
-        return self.get_available_cocktails(alkoholisch=1)
-
-    def get_non_alcoholic_cocktails(self):
-        return self.get_available_cocktails(alkoholisch=0)
+        return drinks_map, requirements, levels
 
     # -------------------------------------------------------------------------
     # Ingredients
     # -------------------------------------------------------------------------
 
+    @metrics.timed(DB_TIMER)
     def get_ingredients_status(self):
         """Status aller Zutaten."""
         with self._get_conn() as conn:
@@ -113,35 +435,82 @@ class CocktailDatabase:
                 FROM ingredients
                 ORDER BY ingredientID
             ''')
-            return [
-                {
-                    'ingredient_id': row[0],
-                    'ingredient_name': row[1],
-                    'is_liquid': bool(row[2]),
-                    'current_level': row[3],
-                    'max_level': row[4],
-                    'pump_id': row[0] - 1 if row[2] == 1 else None,
-                }
-                for row in cursor.fetchall()
-            ]
+            return [self._ingredient_row(row) for row in cursor.fetchall()]
 
-    def update_ingredient_level(self, ingredient_id, used_amount):
-        """Reduziert den Level einer Zutat nach dem Mixen."""
+    @metrics.timed(DB_TIMER)
+    def get_ingredient(self, ingredient_id):
+        """Status einer einzelnen Zutat (None, wenn es sie nicht gibt)."""
         with self._get_conn() as conn:
-            conn.execute('''
+            row = conn.execute('''
+                SELECT ingredientID, ingredient, isLiquid, currentLevel, maxLevel
+                FROM ingredients
+                WHERE ingredientID = ?
+            ''', (ingredient_id,)).fetchone()
+        return self._ingredient_row(row) if row else None
+
+    @metrics.timed(DB_TIMER)
+    def reserve_order(self, cocktail):
+        """Vorrat einer Bestellung reservieren und sie im Bestell-Log anlegen (eine Transaktion).
+
+        Rückgabe: ID im Bestell-Log, oder None, wenn eine Zutat nicht reicht.
+        """
+        amounts = self._sum_amounts(cocktail['liquid_recipe'])
+        conn = self._get_conn()
+        with conn:
+            if amounts and not self._deduct(conn, amounts):
+                conn.rollback()
+                return None
+            log_id = order_log.log_order(conn, cocktail['id'], cocktail['name'], amounts, time.time())
+            levels = self._fetch_levels(conn, amounts) if amounts else {}
+
+        if levels:
+            self._consumed(amounts, levels)
+        return log_id
+
+    @metrics.timed(DB_TIMER)
+    def finish_order(self, log_id, status, started_at=None, finished_at=None, refund_recipe=()):
+        """Endstatus einer Bestellung loggen und nicht Gefördertes zurückbuchen (eine Transaktion).
+
+        status: 'done', 'failed', 'cancelled' oder 'rejected' (Warteschlange voll).
+        """
+        refunds = self._sum_amounts(refund_recipe)
+        conn = self._get_conn()
+        with conn:
+            if order_log.log_finish(conn, log_id, status, started_at, finished_at or time.time(), refunds) is None:
+                return False
+            levels = {}
+            if refunds:
+                conn.executemany('''
+                    UPDATE ingredients
+                    SET currentLevel = currentLevel + ?
+                    WHERE ingredientID = ?
+                ''', [(amount, ing_id) for ing_id, amount in refunds.items()])
+                levels = self._fetch_levels(conn, refunds)
+
+        if levels:
+            self._levels_changed(levels)
+        return True
+
+    @metrics.timed(DB_TIMER)
+    def restock_recipe(self, recipe):
+        """Gibt eine Reservierung zurück (z. B. wenn das Mixen fehlgeschlagen ist)."""
+        amounts = self._sum_amounts(recipe)
+        if not amounts:
+            return {}
+
+        conn = self._get_conn()
+        with conn:
+            conn.executemany('''
                 UPDATE ingredients
-                SET currentLevel = MAX(0, currentLevel - ?)
+                SET currentLevel = currentLevel + ?
                 WHERE ingredientID = ?
-            ''', (used_amount, ingredient_id))
+            ''', [(amount, ing_id) for ing_id, amount in amounts.items()])
+            levels = self._fetch_levels(conn, amounts)
 
-            cursor = conn.execute(
-                'SELECT ingredient, currentLevel FROM ingredients WHERE ingredientID = ?',
-                (ingredient_id,)
-            )
-            result = cursor.fetchone()
-            if result:
-                print(f"📉 {result[0]}: -{used_amount}ml (noch {result[1]}ml)")
+        self._levels_changed(levels)
+        return levels
 
+    @metrics.timed(DB_TIMER)
     def set_ingredient_level(self, ingredient_id, new_level):
         """Setzt den Level einer Zutat auf einen bestimmten Wert."""
         new_level = max(0, new_level)
@@ -153,6 +522,9 @@ class CocktailDatabase:
             ''', (new_level, new_level, ingredient_id))
             print(f"🔄 Zutat {ingredient_id} auf {new_level}ml gesetzt")
 
+        self._levels_changed({ingredient_id: new_level}, max_levels={ingredient_id: new_level})
+
+    @metrics.timed(DB_TIMER)
     def refill_ingredient(self, ingredient_id, add_amount):
         """Füllt eine Zutat additiv auf."""
         with self._get_conn() as conn:
@@ -175,22 +547,178 @@ class CocktailDatabase:
             ''', (new_level, new_max, ingredient_id))
 
             print(f"🔄 Zutat {ingredient_id}: {current_level}ml + {add_amount}ml = {new_level}ml")
-            return True
 
+        self._levels_changed({ingredient_id: new_level}, max_levels={ingredient_id: new_max})
+        return True
+
+    @metrics.timed(DB_TIMER)
     def refill_all_ingredients(self, level):
         """Setzt alle Zutaten auf einen bestimmten Level."""
         with self._get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute('UPDATE ingredients SET currentLevel = ?', (level,))
             updated_rows = cursor.rowcount
+            ingredient_ids = [row[0] for row in conn.execute('SELECT ingredientID FROM ingredients')]
             conn.commit()
             print(f"🔄 Alle Zutaten auf {level}ml gesetzt ({updated_rows} Zutaten aktualisiert)")
-            return updated_rows
+
+        self._levels_changed({ing_id: level for ing_id in ingredient_ids})
+        return updated_rows
+
+    @metrics.timed(DB_TIMER)
+    def update_ingredients(self, operations):
+        """Mehrere Zutaten in einer Transaktion setzen bzw. auffüllen.
+
+        operations: Liste von {'ingredient_id', 'level'} (absolut, setzt auch
+        maxLevel) oder {'ingredient_id', 'amount'} (additiv), in dieser
+        Reihenfolge angewendet. Gibt es eine ID nicht, wird nichts geändert.
+        Rückgabe: {'updated': [geänderte Zeilen], 'unknown_ids': [...]}.
+        """
+        ids = list(dict.fromkeys(op['ingredient_id'] for op in operations))
+        if not ids:
+            return {'updated': [], 'unknown_ids': []}
+        placeholders = ', '.join('?' * len(ids))
+
+        conn = self._get_conn()
+        with conn:
+            known = {row[0] for row in conn.execute(
+                f'SELECT ingredientID FROM ingredients WHERE ingredientID IN ({placeholders})', ids)}
+            unknown_ids = [ing_id for ing_id in ids if ing_id not in known]
+            if unknown_ids:
+                return {'updated': [], 'unknown_ids': unknown_ids}
+
+            # eine Anweisung für beide Arten, damit die Reihenfolge erhalten bleibt:
+            # level gesetzt → absolut, sonst currentLevel + amount
+            conn.executemany('''
+                UPDATE ingredients
+                SET currentLevel = COALESCE(:level, currentLevel + :amount),
+                    maxLevel = COALESCE(:level, MAX(maxLevel, currentLevel + :amount))
+                WHERE ingredientID = :ingredient_id
+            ''', [
+                {
+                    'ingredient_id': op['ingredient_id'],
+                    'level': max(0, op['level']) if op.get('level') is not None else None,
+                    'amount': op.get('amount'),
+                }
+                for op in operations
+            ])
+            cursor = conn.execute(f'''
+                SELECT ingredientID, ingredient, isLiquid, currentLevel, maxLevel
+                FROM ingredients
+                WHERE ingredientID IN ({placeholders})
+                ORDER BY ingredientID
+            ''', ids)
+            updated = [self._ingredient_row(row) for row in cursor.fetchall()]
+
+        print(f"🔄 {len(operations)} Änderung(en) an {len(updated)} Zutat(en) übernommen")
+        self._levels_changed({row['ingredient_id']: row['current_level'] for row in updated},
+                             max_levels={row['ingredient_id']: row['max_level'] for row in updated})
+        return {'updated': updated, 'unknown_ids': []}
+
+    # -------------------------------------------------------------------------
+    # Statistics (aus den stündlichen Rollups)
+    # -------------------------------------------------------------------------
+
+    @metrics.timed(DB_TIMER)
+    def get_orders_per_hour(self, hours=24):
+        with self._get_conn() as conn:
+            return order_log.orders_per_hour(conn, time.time() - hours * order_log.HOUR)
+
+    @metrics.timed(DB_TIMER)
+    def get_consumption(self, hours=24):
+        """Verbrauchte ml pro Zutat im Zeitfenster."""
+        with self._get_conn() as conn:
+            return order_log.consumption_per_ingredient(conn, time.time() - hours * order_log.HOUR)
+
+    @metrics.timed(DB_TIMER)
+    def get_mix_latency(self, hours=24):
+        with self._get_conn() as conn:
+            return order_log.latency_summary(conn, time.time() - hours * order_log.HOUR)
+
+    @metrics.timed(DB_TIMER)
+    def get_recent_consumption(self, window_sec):
+        """[(ingredient_id, amount_ml, orderedAt)] der Bestellungen im Zeitfenster (inkl. Rückbuchungen)."""
+        with self._get_conn() as conn:
+            return order_log.recent_pours(conn, time.time() - window_sec)
+
+    def get_order_history(self, since):
+        """[(drink_id, orderedAt)] aller Bestellungen seit since, älteste zuerst (für den Simulator)."""
+        with self._get_conn() as conn:
+            return order_log.orders_since(conn, since)
 
     # -------------------------------------------------------------------------
     # Helpers
     # -------------------------------------------------------------------------
 
+    @staticmethod
+    def _deduct(conn, amounts):
+        """Abbuchung in der laufenden Transaktion; False, wenn eine Zutat nicht reicht."""
+        cursor = conn.executemany('''
+            UPDATE ingredients
+            SET currentLevel = currentLevel - ?
+            WHERE ingredientID = ? AND currentLevel >= ?
+        ''', [(amount, ing_id, amount) for ing_id, amount in amounts.items()])
+        return cursor.rowcount == len(amounts)
+
+    def _consumed(self, amounts, levels):
+        print("📉 " + ", ".join(f"#{ing_id}: -{amounts[ing_id]}ml (noch {level}ml)"
+                                for ing_id, level in levels.items()))
+        self._levels_changed(levels)
+
+    @staticmethod
+    def _ingredient_row(row):
+        return {
+            'ingredient_id': row[0],
+            'ingredient_name': row[1],
+            'is_liquid': bool(row[2]),
+            'current_level': row[3],
+            'max_level': row[4],
+            'pump_id': row[0] - 1 if row[2] == 1 else None,
+        }
+
+    def _levels_changed(self, levels, remember=True, max_levels=None):
+        """Write-Through in den Menü-Cache und Delta an Live-Status-Abonnenten.
+
+        max_levels: neue maxLevel-Werte, falls der Schreiber sie geändert hat – sonst
+        hielte sync_external_writes die eigene Änderung für eine fremde.
+        """
+        self._menu.update_levels(levels)
+        self._bump_version()
+        if remember:
+            with self._sync_lock:
+                if self._snapshot is not None:
+                    for ing_id, level in levels.items():
+                        max_level = self._snapshot.get(ing_id, (None, None))[1]
+                        if max_levels and ing_id in max_levels:
+                            max_level = max_levels[ing_id]
+                        self._snapshot[ing_id] = (level, max_level)
+        for listener in self._level_listeners:
+            listener(levels)
+        if self.events is not None:
+            self.events.publish('levels', {
+                'levels': [{'ingredient_id': ing_id, 'current_level': level}
+                           for ing_id, level in levels.items()],
+            })
+
+    @staticmethod
+    def _sum_amounts(recipe):
+        """Rezeptzeilen zu {ingredient_id: Menge} zusammenfassen."""
+        amounts = {}
+        for ingredient in recipe:
+            ing_id = ingredient['ingredient_id']
+            amounts[ing_id] = amounts.get(ing_id, 0) + ingredient['amount_ml']
+        return amounts
+
+    @staticmethod
+    def _fetch_levels(conn, ingredient_ids):
+        ids = list(ingredient_ids)
+        placeholders = ', '.join('?' * len(ids))
+        cursor = conn.execute(
+            f'SELECT ingredientID, currentLevel FROM ingredients WHERE ingredientID IN ({placeholders})',
+            ids
+        )
+        return dict(cursor.fetchall())
+
     @staticmethod
     def _get_manual_instruction(ingredient_name, amount):
         instructions = {
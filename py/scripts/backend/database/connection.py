@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import weakref
+
+
+class ConnectionManager:
+    """Eine SQLite-Verbindung pro Thread, im WAL-Modus und mit Statement-Cache."""
+
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),       # Leser blockieren Schreiber nicht mehr
+        ('synchronous', 'NORMAL'),     # im WAL-Modus sicher, spart fsyncs auf der SD-Karte
+        ('temp_store', 'MEMORY'),
+        ('cache_size', -4000),         # ~4 MB Page-Cache pro Verbindung
+    )
+
+    def __init__(self, db_path, busy_timeout=5.0, statement_cache_size=128):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}   # thread ident -> (weakref auf Thread, Verbindung)
+        self._trace_callback = None
+        self.created = 0
+
+    def get(self):
+        """Verbindung des aktuellen Threads (wird beim ersten Aufruf geöffnet)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections[threading.get_ident()] = (weakref.ref(threading.current_thread()), conn)
+                self.created += 1
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            connections = [conn for _, conn in self._connections.values()]
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def set_trace_callback(self, callback):
+        """callback(sql) für jede ausgeführte Anweisung, auf allen Verbindungen (None = aus)."""
+        with self._lock:
+            self._trace_callback = callback
+            for _, conn in self._connections.values():
+                conn.set_trace_callback(callback)
+
+    def stats(self):
+        with self._lock:
+            return {'open_connections': len(self._connections), 'created': self.created}
+
+    def _connect(self):
+        # check_same_thread=False nur, damit verwaiste Verbindungen beendeter
+        # Threads aufgeräumt werden können – benutzt wird jede nur von ihrem Thread.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.statement_cache_size,
+            check_same_thread=False,
+        )
+        for name, value in self.PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def _prune_dead_threads(self):
+        for ident, (thread_ref, conn) in list(self._connections.items()):
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                del self._connections[ident]
+                conn.close()
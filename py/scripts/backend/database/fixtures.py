@@ -0,0 +1,28 @@
+import random
+
+PUMP_COUNT = 19
+
+
+def generate_menu(conn, drink_count, ingredient_count, seed=42):
+    """Synthetische Karte in eine migrierte, leere Datenbank schreiben: drink_count Drinks mit je 2-6 Zutaten.
+
+    Flüssige Zutaten gibt es höchstens so viele wie Pumpen, alle weiteren sind manuell.
+    Für Last-Tests und um Abfragepläne bei großen Karten zu prüfen.
+    """
+    rng = random.Random(seed)
+    liquid_count = min(ingredient_count - 1, PUMP_COUNT)
+    manual_count = ingredient_count - liquid_count
+    with conn:
+        conn.executemany(
+            'INSERT INTO ingredients (ingredient, isLiquid, currentLevel, maxLevel) VALUES (?, ?, ?, ?)',
+            [(f'Zutat {i}', 1, 10_000_000, 10_000_000) for i in range(1, liquid_count + 1)]
+            + [(f'Deko {i}', 0, 10_000_000, 10_000_000) for i in range(1, manual_count + 1)],
+        )
+        for drink_id in range(1, drink_count + 1):
+            conn.execute('INSERT INTO drinks (Getränk, Alkohol, Beschreibung) VALUES (?, ?, ?)',
+                         (f'Drink {drink_id}', rng.random() < 0.7, f'Generierter Drink {drink_id}'))
+            liquids = rng.sample(range(1, liquid_count + 1), rng.randint(2, min(6, liquid_count)))
+            rows = [(drink_id, ing_id, rng.choice((20, 30, 40, 60, 80, 120))) for ing_id in liquids]
+            if rng.random() < 0.3:
+                rows.append((drink_id, liquid_count + rng.randint(1, manual_count), rng.randint(1, 3)))
+            conn.executemany('INSERT INTO recipies (drinkID, ingredientID, level) VALUES (?, ?, ?)', rows)
@@ -0,0 +1,190 @@
+"""Schema-Migrationen für mixes.db, versioniert über PRAGMA user_version.
+
+Jede Migration läuft genau einmal in einer eigenen IMMEDIATE-Transaktion; starten
+mehrere Prozesse gleichzeitig (Worker, Hardware-Prozess), wartet der zweite auf
+den ersten und findet die Version danach schon erhöht vor. Bestehende
+Datenbanken ohne Version (0) werden übernommen: alle Anweisungen sind
+IF NOT EXISTS.
+
+Aufruf aus py/scripts/backend:
+
+    python -m database.migrations                       # database/mixes.db aktualisieren
+    python -m database.migrations --db /tmp/big.db --seed-drinks 5000 --explain
+"""
+import argparse
+import sqlite3
+import sys
+
+from database import order_log
+
+BASE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ingredients (
+    ingredientID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL UNIQUE,
+    ingredient TEXT NOT NULL,
+    isLiquid INTEGER NOT NULL DEFAULT 0,
+    currentLevel INTEGER NOT NULL DEFAULT (0),
+    maxLevel INT DEFAULT 2000 NOT NULL
+);
+CREATE TABLE IF NOT EXISTS drinks (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL UNIQUE,
+    Getränk TEXT NOT NULL,
+    Alkohol INTEGER NOT NULL DEFAULT (1),
+    Beschreibung TEXT
+);
+CREATE TABLE IF NOT EXISTS recipies (
+    drinkID INTEGER NOT NULL REFERENCES drinks (ID),
+    ingredientID INTEGER NOT NULL REFERENCES ingredients (ingredientID),
+    level INTEGER NOT NULL,
+    UNIQUE (drinkID, ingredientID)
+);
+'''
+
+# eingefrorene Kopie: spätere Änderungen am Bestell-Log brauchen eine neue Migration
+ORDER_LOG_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS orders (
+    orderID INTEGER PRIMARY KEY AUTOINCREMENT,
+    drinkID INTEGER NOT NULL,
+    drink TEXT NOT NULL,
+    orderedAt REAL NOT NULL,
+    startedAt REAL,
+    finishedAt REAL,
+    status TEXT NOT NULL DEFAULT 'queued'
+);
+CREATE INDEX IF NOT EXISTS idx_orders_ordered_at ON orders (orderedAt);
+CREATE INDEX IF NOT EXISTS idx_orders_drink ON orders (drinkID, orderedAt);
+
+CREATE TABLE IF NOT EXISTS pours (
+    orderID INTEGER NOT NULL REFERENCES orders (orderID),
+    ingredientID INTEGER NOT NULL,
+    amountMl REAL NOT NULL,
+    loggedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pours_order ON pours (orderID);
+
+CREATE TABLE IF NOT EXISTS order_stats_hourly (
+    hour INTEGER PRIMARY KEY,
+    ordered INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    mixSecTotal REAL NOT NULL DEFAULT 0,
+    latencySecTotal REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ingredient_usage_hourly (
+    hour INTEGER NOT NULL,
+    ingredientID INTEGER NOT NULL,
+    amountMl REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, ingredientID)
+) WITHOUT ROWID;
+'''
+
+# Menü-Abfrage: drinks → recipies ohne Tabellenzugriff und schon nach Zutat sortiert.
+# Füllstandsbuchungen brauchen keinen Index, sie treffen ingredients über die rowid.
+# Ohne Statistik wählt der Planer bei kleinen Karten den UNIQUE-Index plus Sortierung.
+RECIPE_INDEXES = '''
+CREATE INDEX IF NOT EXISTS idx_recipies_drink_cover ON recipies (drinkID, ingredientID, level);
+ANALYZE;
+'''
+
+# (Version, Beschreibung, SQL) – nur anhängen, nie bestehende Einträge ändern
+MIGRATIONS = [
+    (1, 'Rezept-Tabellen', BASE_SCHEMA),
+    (2, 'Bestell-Log und Rollups', ORDER_LOG_SCHEMA),
+    (3, 'Covering-Index für die Menü-Abfrage', RECIPE_INDEXES),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Ausstehende Migrationen anwenden; Rückgabe: Liste der angewendeten Versionen."""
+    if conn.in_transaction:
+        conn.commit()
+    version = schema_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f'Datenbank hat Schema-Version {version}, dieser Code kennt nur bis {LATEST_VERSION}')
+    applied = []
+    for number, description, sql in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        # executescript würde offene Transaktionen selbst committen – deshalb Anweisung für Anweisung
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= number:     # anderer Prozess war schneller
+                conn.execute('ROLLBACK')
+                continue
+            for statement in _statements(sql):
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        print(f"🗄️ Schema-Migration {number}: {description}")
+        applied.append(number)
+    return applied
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN als Liste von Zeilen ('SCAN d', 'SEARCH r USING …')."""
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def _statements(script):
+    statements, current = [], ''
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ''
+    return statements
+
+
+def main():
+    from database.cocktail_db import MENU_QUERY
+    from database.fixtures import generate_menu
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='database/mixes.db')
+    parser.add_argument('--seed-drinks', type=int, default=0, help='synthetische Karte erzeugen (nur in leere DB)')
+    parser.add_argument('--seed-ingredients', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--explain', action='store_true', help='Abfragepläne der heißen Abfragen ausgeben')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    migrate(conn)
+    print(f"Schema-Version {schema_version(conn)} ({args.db})")
+
+    if args.seed_drinks:
+        if conn.execute('SELECT COUNT(*) FROM drinks').fetchone()[0]:
+            print('❌ drinks ist nicht leer – synthetische Karte nur in eine neue Datenbank', file=sys.stderr)
+            return 1
+        generate_menu(conn, args.seed_drinks, args.seed_ingredients, args.seed)
+        conn.execute('ANALYZE')
+        print(f"🌱 {args.seed_drinks} Drinks mit {args.seed_ingredients} Zutaten erzeugt")
+
+    if args.explain:
+        queries = {
+            'Menü': (MENU_QUERY, ()),
+            'Füllstand buchen': ('UPDATE ingredients SET currentLevel = currentLevel - ? WHERE ingredientID = ?', (0, 1)),
+            'Verbrauch im Zeitfenster': (order_log.RECENT_POURS_QUERY, (0,)),
+        }
+        slow = False
+        for name, (sql, params) in queries.items():
+            print(f"\n{name}:")
+            for line in explain(conn, sql, params):
+                # SCAN über recipies oder eine Sortier-B-Baum heißt: Index fehlt oder wird nicht genutzt
+                warn = line.startswith('SCAN r') or 'TEMP B-TREE' in line
+                slow |= warn
+                print(f"  {'⚠️ ' if warn else ''}{line}")
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Bestell-Log und stündliche Rollups für die Verbrauchsstatistik.
+
+orders/pours werden nur angehängt (Rückbuchungen als negative Pours). Die
+Auswertungen lesen ausschließlich die Rollup-Tabellen, die in derselben
+Transaktion wie die Bestandsbuchung fortgeschrieben werden – ihre Größe hängt
+von der Zahl der Stunden ab, nicht von der Zahl der Bestellungen.
+"""
+
+HOUR = 3600
+
+# Tabellen: Migration 2 in database/migrations.py
+
+RECENT_POURS_QUERY = '''
+    SELECT p.ingredientID, p.amountMl, o.orderedAt
+    FROM orders o
+    JOIN pours p ON p.orderID = o.orderID
+    WHERE o.orderedAt >= ?
+'''
+
+# Endstatus einer Bestellung -> Zählerspalte in order_stats_hourly
+FINAL_STATUS_COLUMNS = {'done': 'completed', 'failed': 'failed', 'cancelled': 'cancelled', 'rejected': 'cancelled'}
+
+
+def hour_of(timestamp):
+    return int(timestamp // HOUR) * HOUR
+
+
+def log_order(conn, drink_id, drink_name, amounts, ordered_at):
+    """Bestellung und ihre Pours anhängen; Aufrufer hält die Transaktion. Rückgabe: orderID."""
+    cursor = conn.execute(
+        'INSERT INTO orders (drinkID, drink, orderedAt) VALUES (?, ?, ?)',
+        (drink_id, drink_name, ordered_at)
+    )
+    order_id = cursor.lastrowid
+    _append_pours(conn, order_id, amounts, ordered_at, ordered_at)
+    conn.execute('''
+        INSERT INTO order_stats_hourly (hour, ordered) VALUES (?, 1)
+        ON CONFLICT (hour) DO UPDATE SET ordered = ordered + 1
+    ''', (hour_of(ordered_at),))
+    return order_id
+
+
+def log_finish(conn, order_id, status, started_at, finished_at, refunds):
+    """Endstatus und Rückbuchungen (negative Pours) einer Bestellung festhalten.
+
+    Gibt orderedAt zurück, oder None, wenn die Bestellung unbekannt oder schon abgeschlossen ist.
+    """
+    row = conn.execute(
+        "SELECT orderedAt FROM orders WHERE orderID = ? AND status = 'queued'", (order_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    ordered_at = row[0]
+
+    conn.execute(
+        'UPDATE orders SET status = ?, startedAt = ?, finishedAt = ? WHERE orderID = ?',
+        (status, started_at, finished_at, order_id)
+    )
+    _append_pours(conn, order_id, {ing_id: -amount for ing_id, amount in refunds.items()},
+                  ordered_at, finished_at)
+
+    column = FINAL_STATUS_COLUMNS[status]
+    mix_sec = finished_at - started_at if status == 'done' and started_at else 0.0
+    latency_sec = finished_at - ordered_at if status == 'done' else 0.0
+    conn.execute(f'''
+        INSERT INTO order_stats_hourly (hour, {column}, mixSecTotal, latencySecTotal) VALUES (?, 1, ?, ?)
+        ON CONFLICT (hour) DO UPDATE SET
+            {column} = {column} + 1,
+            mixSecTotal = mixSecTotal + excluded.mixSecTotal,
+            latencySecTotal = latencySecTotal + excluded.latencySecTotal
+    ''', (hour_of(ordered_at), mix_sec, latency_sec))
+    return ordered_at
+
+
+def _append_pours(conn, order_id, amounts, ordered_at, logged_at):
+    # Verbrauch wird der Bestellstunde zugerechnet, damit Rückbuchungen ihn dort wieder aufheben
+    conn.executemany(
+        'INSERT INTO pours (orderID, ingredientID, amountMl, loggedAt) VALUES (?, ?, ?, ?)',
+        [(order_id, ing_id, amount, logged_at) for ing_id, amount in amounts.items()]
+    )
+    conn.executemany('''
+        INSERT INTO ingredient_usage_hourly (hour, ingredientID, amountMl) VALUES (?, ?, ?)
+        ON CONFLICT (hour, ingredientID) DO UPDATE SET amountMl = amountMl + excluded.amountMl
+    ''', [(hour_of(ordered_at), ing_id, amount) for ing_id, amount in amounts.items()])
+
+
+def orders_per_hour(conn, since):
+    cursor = conn.execute('''
+        SELECT hour, ordered, completed, failed, cancelled, mixSecTotal, latencySecTotal
+        FROM order_stats_hourly
+        WHERE hour >= ?
+        ORDER BY hour
+    ''', (hour_of(since),))
+    return [
+        {
+            'hour': row[0],
+            'ordered': row[1],
+            'completed': row[2],
+            'failed': row[3],
+            'cancelled': row[4],
+            'avg_mix_sec': round(row[5] / row[2], 2) if row[2] else None,
+            'avg_latency_sec': round(row[6] / row[2], 2) if row[2] else None,
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+def consumption_per_ingredient(conn, since):
+    cursor = conn.execute('''
+        SELECT u.ingredientID, i.ingredient, SUM(u.amountMl)
+        FROM ingredient_usage_hourly u
+        LEFT JOIN ingredients i ON i.ingredientID = u.ingredientID
+        WHERE u.hour >= ?
+        GROUP BY u.ingredientID
+        ORDER BY SUM(u.amountMl) DESC
+    ''', (hour_of(since),))
+    return [
+        {'ingredient_id': row[0], 'ingredient_name': row[1], 'consumed_ml': round(row[2], 1)}
+        for row in cursor.fetchall()
+    ]
+
+
+def recent_pours(conn, since):
+    """Pours der Bestellungen seit since, über den Zeitindex der orders-Tabelle."""
+    return conn.execute(RECENT_POURS_QUERY, (since,)).fetchall()
+
+
+def orders_since(conn, since):
+    cursor = conn.execute(
+        'SELECT drinkID, orderedAt FROM orders WHERE orderedAt >= ? ORDER BY orderedAt', (since,)
+    )
+    return cursor.fetchall()
+
+
+def latency_summary(conn, since):
+    row = conn.execute('''
+        SELECT COALESCE(SUM(completed), 0), COALESCE(SUM(mixSecTotal), 0), COALESCE(SUM(latencySecTotal), 0)
+        FROM order_stats_hourly
+        WHERE hour >= ?
+    ''', (hour_of(since),)).fetchone()
+    completed, mix_total, latency_total = row
+    return {
+        'completed': completed,
+        'avg_mix_sec': round(mix_total / completed, 2) if completed else None,
+        'avg_latency_sec': round(latency_total / completed, 2) if completed else None,
+    }
@@ -0,0 +1,99 @@
+"""Produktionsstart: Hardware-Prozess + mehrere HTTP-Worker.
+
+    python serve.py --workers 3 --threads 8 --bind 0.0.0.0:5000
+
+Ein einzelner Prozess besitzt die GPIO-Pins (core/hardware_service.py). HTTP wird
+von gunicorn (gthread-Worker) bedient; die Worker reichen Bestellungen und
+Pumpenbefehle über einen Unix-Socket an den Hardware-Prozess weiter.
+Ohne gunicorn läuft ein einzelner Thread-Server von werkzeug.
+"""
+import argparse
+import atexit
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+DEFAULT_SOCKET = '/tmp/cocktailmixer-hardware.sock'
+
+
+def start_hardware_process(socket_path):
+    """Hardware-Prozess als eigenes Programm starten.
+
+    Bewusst nicht über multiprocessing: gunicorn forkt die Worker aus diesem
+    Prozess, und deren atexit-Handler würden multiprocessing-Kinder beenden.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    process = subprocess.Popen([sys.executable, '-m', 'core.hardware_service'], env=os.environ.copy())
+    # warten, bis der Socket existiert, damit die ersten Requests nicht ins Leere laufen
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError('Hardware-Prozess konnte nicht gestartet werden')
+        time.sleep(0.05)
+
+    owner_pid = os.getpid()
+
+    def stop():
+        if os.getpid() == owner_pid:   # nicht aus geforkten Workern heraus
+            process.terminate()
+
+    atexit.register(stop)
+    return process
+
+
+def run_gunicorn(bind, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class CocktailApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('timeout', 0)   # SSE-Streams laufen beliebig lange
+
+        def load(self):
+            # erst im Worker importieren: jeder Worker baut seinen eigenen Menü-Cache auf
+            from app import app
+            return app
+
+    CocktailApplication().run()
+
+
+def run_werkzeug(bind, threads):
+    from werkzeug.serving import run_simple
+    from app import app
+
+    host, port = bind.rsplit(':', 1)
+    print(f"⚠️ gunicorn nicht installiert – starte einzelnen Thread-Server auf {bind}")
+    run_simple(host, int(port), app, threaded=threads > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default='0.0.0.0:5000')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--socket', default=os.environ.get('COCKTAIL_HARDWARE_SOCKET', DEFAULT_SOCKET))
+    args = parser.parse_args()
+
+    # Hardware-Prozess und Worker (beim Import von api/cocktails.py) lesen diese Variablen
+    os.environ['COCKTAIL_HARDWARE_SOCKET'] = args.socket
+    os.environ['COCKTAIL_HARDWARE_AUTHKEY'] = secrets.token_hex(16)
+
+    print("🚀 Starte Cocktail-Maschine Backend (Produktion)...")
+    start_hardware_process(args.socket)
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_werkzeug(args.bind, args.threads)
+    else:
+        run_gunicorn(args.bind, args.workers, args.threads)
+
+
+if __name__ == '__main__':
+    main()
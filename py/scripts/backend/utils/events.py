@@ -0,0 +1,65 @@
+import itertools
+import queue
+import threading
+import time
+
+
+class Subscription:
+    """Begrenzte Event-Warteschlange eines Abonnenten (z. B. eines SSE-Clients)."""
+
+    def __init__(self, max_queue):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def put(self, event):
+        # Langsame Clients verlieren die ältesten Events statt den Publisher zu blockieren
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Nächstes Event oder None nach timeout Sekunden."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Prozessinterner Publish/Subscribe-Kanal für Live-Status-Events."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        sub = Subscription(self.max_queue)
+        with self._lock:
+            self._subscribers = self._subscribers + [sub]
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not sub]
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Event an alle Abonnenten verteilen – ohne Abonnenten passiert nichts."""
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        event = {'id': next(self._ids), 'type': event_type, 'time': time.time(), 'data': data}
+        for sub in subscribers:
+            sub.put(event)
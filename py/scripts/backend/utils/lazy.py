@@ -0,0 +1,39 @@
+import threading
+
+
+class Lazy:
+    """Stellvertreter, der das eigentliche Objekt erst beim ersten Attributzugriff baut.
+
+    Für teure Initialisierungen (GPIO-Setup, Hardware-Verbindung), die den Start
+    der App nicht aufhalten sollen.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'lazy')
+        self._lock = threading.Lock()
+        self._target = None
+
+    @property
+    def initialized(self):
+        return self._target is not None
+
+    def get(self):
+        """Objekt bauen (einmalig, threadsicher) und zurückgeben."""
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+                target = self._target
+        return target
+
+    def __getattr__(self, name):
+        # nur für Attribute, die der Stellvertreter selbst nicht hat
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = 'bereit' if self.initialized else 'nicht initialisiert'
+        return f'<Lazy {self._name}: {state}>'
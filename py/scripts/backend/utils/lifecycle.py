@@ -0,0 +1,74 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Lifecycle:
+    """Startphasen mit Zeitmessung – Grundlage für Liveness, Readiness und den Startbericht."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._started = clock()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._phases = []        # [{'name', 'started_ms', 'duration_ms', 'ok', 'error'}]
+        self.ready_after_ms = None
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        """Startphase messen; eine Ausnahme wird festgehalten und weitergereicht."""
+        start = self._clock()
+        entry = {'name': name, 'started_ms': self._ms(start), 'duration_ms': None, 'ok': False, 'error': None}
+        with self._lock:
+            self._phases.append(entry)
+        try:
+            yield
+            entry['ok'] = True
+        except Exception as e:
+            entry['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            entry['duration_ms'] = self._ms(self._clock()) - entry['started_ms']
+
+    def mark_ready(self):
+        self.ready_after_ms = self._ms(self._clock())
+        self._ready.set()
+        print(f"⏱️ Bereit nach {self.ready_after_ms:.0f}ms")
+
+    def fail(self, error):
+        """Start endgültig gescheitert: Readiness bleibt aus, wartende Requests geben auf."""
+        self.error = f'{type(error).__name__}: {error}'
+        self._ready.set()
+        print(f"❌ Start fehlgeschlagen: {self.error}")
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    def wait_ready(self, timeout=None):
+        """Blockiert bis zum Ende des Starts; True, wenn er erfolgreich war."""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def uptime_sec(self):
+        return self._clock() - self._started
+
+    def report(self):
+        with self._lock:
+            phases = [dict(p) for p in self._phases]
+        for p in phases:
+            p['started_ms'] = round(p['started_ms'], 1)
+            if p['duration_ms'] is not None:
+                p['duration_ms'] = round(p['duration_ms'], 1)
+        return {
+            'ready': self.ready,
+            'error': self.error,
+            'started_at': self.started_at,
+            'ready_after_ms': round(self.ready_after_ms, 1) if self.ready_after_ms is not None else None,
+            'phases': phases,
+        }
+
+    def _ms(self, t):
+        return (t - self._started) * 1000
@@ -0,0 +1,127 @@
+import functools
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """Zähler, Gauges und Histogramme im Prometheus-Textformat.
+
+    Ist die Registry abgeschaltet, kehrt jeder Aufruf nach einer einzigen if-Abfrage zurück.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._meta = {}          # name -> (type, help)
+        self._counters = {}      # name -> {label_key: value}
+        self._gauges = {}
+        self._histograms = {}    # name -> {label_key: [bucket_counts..., sum, count]}
+        self._collectors = []    # callables, die beim Export Gauges setzen
+
+    def describe(self, name, metric_type, help_text):
+        self._meta[name] = (metric_type, help_text)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * (len(DEFAULT_BUCKETS) + 2)
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def add_collector(self, collector):
+        """collector(registry) wird vor jedem Export aufgerufen (für Momentanwerte)."""
+        self._collectors.append(collector)
+
+    def timed(self, name, **labels):
+        """Decorator: Aufrufe und Laufzeit einer Funktion als Histogramm erfassen."""
+        def decorator(fn):
+            fn_labels = dict(labels, method=fn.__name__)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **fn_labels)
+            return wrapper
+        return decorator
+
+    def render(self):
+        """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+        for collector in self._collectors:
+            collector(self)
+
+        lines = []
+        with self._lock:
+            for kind, store in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(store.items()):
+                    self._header(lines, name, kind)
+                    for key, value in series.items():
+                        lines.append(f'{name}{_format_labels(key)} {value}')
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, 'histogram')
+                for key, state in series.items():
+                    for bound, count in zip(DEFAULT_BUCKETS, state):
+                        lines.append(f'{name}_bucket{_format_labels(key, [("le", bound)])} {count}')
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", "+Inf")])} {state[-1]}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {state[-2]}')
+                    lines.append(f'{name}_count{_format_labels(key)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, default_type):
+        metric_type, help_text = self._meta.get(name, (default_type, ''))
+        if help_text:
+            lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+
+# Prozessweite Registry; COCKTAIL_METRICS=0 schaltet die Erfassung ab
+registry = MetricsRegistry(enabled=os.environ.get('COCKTAIL_METRICS', '1') != '0')
+
+registry.describe('cocktail_http_request_duration_seconds', 'histogram', 'Antwortzeit der API pro Endpunkt')
+registry.describe('cocktail_http_requests_total', 'counter', 'API-Requests pro Endpunkt und Status')
+registry.describe('cocktail_db_call_duration_seconds', 'histogram', 'Laufzeit der CocktailDatabase-Methoden')
+registry.describe('cocktail_pump_runtime_seconds_total', 'counter', 'Laufzeit pro Pumpe')
+registry.describe('cocktail_pump_dispensed_ml_total', 'counter', 'Geförderte Menge pro Pumpe')
+registry.describe('cocktail_mixes_total', 'counter', 'Gemixte Cocktails nach Name und Ergebnis')
+registry.describe('cocktail_pin_attempts_rejected_total', 'counter', 'Abgewiesene PIN-Versuche (Limit oder Sperre)')
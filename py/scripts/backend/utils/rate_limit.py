@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+# PIN-Eingaben: 5 Versuche am Stück, dann einer alle 2 s; nach 5 falschen PINs in Folge
+# 30 s Sperre, die sich bei jedem weiteren Fehler verdoppelt
+PIN_LIMITS = {'rate_per_sec': 0.5, 'burst': 5, 'free_failures': 5, 'lockout_sec': 30, 'max_lockout_sec': 900}
+
+
+class _Client:
+    __slots__ = ('tokens', 'refilled_at', 'failures', 'locked_until', 'seen_at')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.refilled_at = now
+        self.failures = 0
+        self.locked_until = 0.0
+        self.seen_at = now
+
+
+class RateLimiter:
+    """Token-Bucket pro Client mit exponentieller Sperre nach Fehlversuchen.
+
+    Jeder Versuch kostet ein Token (burst Tokens, rate_per_sec kommen nach).
+    Ab free_failures Fehlversuchen in Folge wird der Client gesperrt, erst für
+    lockout_sec, bei jedem weiteren Fehler doppelt so lange (höchstens
+    max_lockout_sec). Höchstens max_clients Einträge: bei Platzmangel fliegt der
+    am längsten inaktive Client raus, ungesperrte Einträge verfallen nach stale_sec.
+    """
+
+    def __init__(self, rate_per_sec=0.5, burst=5, free_failures=5, lockout_sec=30, max_lockout_sec=900,
+                 max_clients=1024, stale_sec=3600, clock=time.monotonic):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.free_failures = free_failures
+        self.lockout_sec = lockout_sec
+        self.max_lockout_sec = max_lockout_sec
+        self.max_clients = max_clients
+        self.stale_sec = stale_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()    # client -> _Client, zuletzt gesehen am Ende
+        self.rejected = 0
+        self.lockouts = 0
+
+    def acquire(self, client):
+        """(erlaubt, retry_after_sec) für einen Versuch von client."""
+        with self._lock:
+            now = self._clock()
+            state = self._touch(client, now)
+            if state.locked_until > now:
+                self.rejected += 1
+                return False, state.locked_until - now
+            state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate_per_sec)
+            state.refilled_at = now
+            if state.tokens < 1:
+                self.rejected += 1
+                return False, (1 - state.tokens) / self.rate_per_sec
+            state.tokens -= 1
+            return True, 0.0
+
+    def record_failure(self, client):
+        """Fehlversuch zählen; Rückgabe: Sperrdauer in Sekunden (0 = noch keine Sperre)."""
+        with self._lock:
+            now = self._clock()
+            state = self._touch(client, now)
+            state.failures += 1
+            excess = state.failures - self.free_failures
+            if excess < 0:
+                return 0.0
+            duration = min(self.max_lockout_sec, self.lockout_sec * 2 ** min(excess, 32))
+            state.locked_until = now + duration
+            self.lockouts += 1
+            return duration
+
+    def record_success(self, client):
+        with self._lock:
+            state = self._clients.get(client)
+            if state is not None:
+                state.failures = 0
+
+    def stats(self):
+        with self._lock:
+            now = self._clock()
+            return {
+                'clients': len(self._clients),
+                'locked_clients': sum(1 for s in self._clients.values() if s.locked_until > now),
+                'rejected': self.rejected,
+                'lockouts': self.lockouts,
+            }
+
+    # -------------------------------------------------------------------------
+    # Intern (Aufrufer hält self._lock)
+    # -------------------------------------------------------------------------
+
+    def _touch(self, client, now):
+        state = self._clients.get(client)
+        if state is None:
+            self._evict(now)
+            state = self._clients[client] = _Client(self.burst, now)
+        else:
+            self._clients.move_to_end(client)
+        state.seen_at = now
+        return state
+
+    def _evict(self, now):
+        # vorne liegen die am längsten inaktiven Clients
+        while self._clients:
+            client, state = next(iter(self._clients.items()))
+            if now - state.seen_at < self.stale_sec and len(self._clients) < self.max_clients:
+                break
+            if state.locked_until > now and len(self._clients) < self.max_clients:
+                break   # gesperrte Clients nur verdrängen, wenn kein Platz mehr ist
+            del self._clients[client]